@@ -1,10 +1,23 @@
 import streamlit as st
-import requests
 import json
+import os
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import time
-from collections import Counter
+
+from prismly.analysis import LOCAL_TIER
+from prismly.classifier import DEFAULT_THRESHOLD, MODEL_FILE, LocalClassifier
+from prismly.engine import DEFAULT_BATCH_TOKEN_BUDGET, DEFAULT_CONCURRENCY
+from prismly.frames import (
+    SORT_COLUMNS, display_frame, distribution, filter_frame, key_metrics, page_slice, results_frame, sort_frame
+)
+from prismly.exports import EXPORT_FORMATS, export_history, export_job, export_path
+from prismly.history import ResultStore
+from prismly.jobs import COALESCE_WINDOW, JobManager, LOCAL_BACKEND, N8N_BACKEND, key_id
+from prismly.n8n import N8N_WEBHOOK_URL
+from prismly.paths import data_path
+from prismly.snapshots import SNAPSHOT_FILE, SnapshotStore, summarize
+from prismly.telemetry import RENDER, STAGES, to_openmetrics
 
 # Page config
 st.set_page_config(
@@ -107,6 +120,22 @@ DEFAULT_RSS_FEEDS = {
     "Microsoft Dev Blogs": "https://devblogs.microsoft.com/feed/"
 }
 
+@st.cache_resource(max_entries=1)
+def _load_local_classifier(modified):
+    return LocalClassifier.load()
+
+def load_local_classifier():
+    """The trained local classifier, reloaded whenever the model file changes"""
+    path = data_path(MODEL_FILE)
+    return _load_local_classifier(os.path.getmtime(path)) if os.path.exists(path) else None
+
+@st.cache_resource
+def get_job_manager():
+    """Process-wide job manager shared by every session"""
+    return JobManager()
+
+job_manager = get_job_manager()
+
 # Sidebar - Search Settings
 with st.sidebar:
     st.markdown("### 🔑 API Configuration")
@@ -120,6 +149,21 @@ with st.sidebar:
     
     if not openai_api_key:
         st.warning("⚠️ Please enter your OpenAI API key to use the analysis feature.")
+    else:
+        key_usage = job_manager.store.usage(key_id(openai_api_key))
+        if key_usage['jobs_run'] or key_usage['jobs_joined']:
+            st.caption(
+                f"🔑 This key: {key_usage['jobs_run']} runs · {key_usage['requests']} OpenAI requests · "
+                f"${key_usage['cost_usd']:.4f} · {key_usage['jobs_joined']} shared runs joined "
+                f"(~${key_usage['saved_usd']:.4f} saved)"
+            )
+    
+    share_runs = st.checkbox(
+        "🤝 Join identical runs",
+        value=True,
+        help=f"If another session is running the same analysis (or finished it in the last {COALESCE_WINDOW // 60} minutes), "
+             "show its results instead of paying for the same work again"
+    )
     
     st.markdown("---")
     
@@ -133,6 +177,102 @@ with st.sidebar:
         help="Number of articles to analyze per feed"
     )
     
+    analysis_backend = st.radio(
+        "🧠 Analysis Backend:",
+        ["Local Engine", "n8n Workflow"],
+        help="Local Engine fetches feeds and calls OpenAI concurrently in-process; n8n Workflow sends everything to the hosted webhook"
+    )
+    
+    training_running = False
+    if analysis_backend == "Local Engine":
+        concurrency = st.slider(
+            "Concurrent AI Requests",
+            min_value=1,
+            max_value=20,
+            value=DEFAULT_CONCURRENCY,
+            help="Maximum number of OpenAI calls in flight at once"
+        )
+        
+        batch_requests = st.checkbox(
+            "📦 Batch articles per request",
+            value=True,
+            help="Pack several articles into one OpenAI call so the instructions are sent once per batch instead of once per article"
+        )
+        batch_token_budget = st.number_input(
+            "Batch token budget",
+            min_value=1000,
+            max_value=100000,
+            value=DEFAULT_BATCH_TOKEN_BUDGET,
+            step=500,
+            disabled=not batch_requests,
+            help="Maximum estimated prompt tokens per batched request"
+        )
+        structured_output = st.checkbox(
+            "🧾 Compact structured output",
+            value=True,
+            help="Send a shorter prompt and have OpenAI answer in a strict JSON schema, with summaries trimmed to a token budget"
+        )
+        
+        use_cache = st.checkbox(
+            "🗄️ Reuse cached analyses",
+            value=True,
+            help="Skip OpenAI for articles whose content, prompt version and model are unchanged since a previous run"
+        )
+        cache_ttl_days = st.number_input(
+            "Cache lifetime (days)",
+            min_value=1,
+            max_value=365,
+            value=30,
+            disabled=not use_cache
+        )
+        
+        only_new_posts = st.checkbox(
+            "🆕 Only analyze new posts",
+            value=False,
+            help="Fetch feeds conditionally (ETag/Last-Modified) and analyze only entries published since the last run"
+        )
+        
+        skip_duplicates = st.checkbox(
+            "🧬 Skip near-duplicate articles",
+            value=True,
+            help="Analyze syndicated and cross-posted copies of an article once, reusing the analysis for the rest"
+        )
+        
+        local_model = load_local_classifier()
+        use_local_classifier = st.checkbox(
+            "⚡ Local pre-classifier",
+            value=False,
+            disabled=local_model is None,
+            help="Score sentiment and archetype with a local model trained on past analyses; only uncertain articles go to OpenAI. Locally scored articles get no insights or recommendations."
+        )
+        local_threshold = st.slider(
+            "Local confidence threshold",
+            min_value=0.5,
+            max_value=0.99,
+            value=DEFAULT_THRESHOLD,
+            step=0.01,
+            disabled=not use_local_classifier,
+            help="Articles the local model scores below this (for sentiment or archetype) are escalated to OpenAI"
+        )
+        if local_model is not None:
+            model_metrics = local_model.metrics
+            st.caption(
+                f"Trained on {model_metrics['examples']:.0f} articles · hold-out: "
+                f"{model_metrics.get('local_share', 0):.0%} answered locally at "
+                f"{model_metrics.get('local_accuracy', 0):.0%} accuracy"
+            )
+        if st.button("Train local classifier", help="Fit the local model on the newest stored LLM analyses, in the background"):
+            st.session_state['training_job_id'] = job_manager.submit_training()
+        training_job = (
+            job_manager.store.get(st.session_state['training_job_id'])
+            if st.session_state.get('training_job_id') else None
+        )
+        training_running = training_job is not None and training_job['status'] in ("queued", "running")
+        if training_running:
+            st.caption("⏳ Training on stored analyses in the background...")
+        elif training_job is not None and training_job['error']:
+            st.warning(training_job['error'])
+    
     st.markdown("---")
     
     # Feed selection mode
@@ -187,7 +327,7 @@ with st.sidebar:
     
     st.markdown("### 🛠️ Tech Stack")
     st.write("• **Frontend:** Streamlit")
-    st.write("• **Workflow:** n8n")
+    st.write("• **Workflow:** Local engine or n8n")
     st.write("• **AI Model:** OpenAI GPT-4o-mini")
     st.write("• **Integration:** Webhook API")
     
@@ -201,7 +341,7 @@ with st.sidebar:
     st.caption("Prismly Framework v1.2")
 
 # n8n Webhook URL - Production (Render Cloud)
-n8n_webhook_url = "https://brand-intelligence-n8n.onrender.com/webhook/brand-intelligence"
+n8n_webhook_url = N8N_WEBHOOK_URL
 
 # Main Dashboard Header
 st.title("🎯 Prismly Dashboard")
@@ -210,40 +350,590 @@ st.markdown("---")
 # Analyze button
 analyze_button = st.button("🔍 Analyze Brand", type="primary", use_container_width=True)
 
-# Function to call n8n webhook
-def call_n8n_webhook(webhook_url, feed_urls, max_articles_per_feed, api_key):
-    """Call n8n webhook with RSS feed URLs and OpenAI API key"""
-    try:
-        payload = {
-            "feeds": feed_urls,
-            "max_articles": max_articles_per_feed,
-            "openai_api_key": api_key
-        }
+def render_key_metrics(df):
+    """Render the Key Metrics boxes - Madison Style"""
+    metrics = key_metrics(df)
+    
+    st.markdown("### 📊 Key Metrics")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    with col1:
+        st.markdown("""
+        <div class="metric-box">
+            <div class="metric-label">Total Articles</div>
+            <div class="metric-value">{}</div>
+        </div>
+        """.format(metrics['total']), unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown("""
+        <div class="metric-box" style="border-left: 4px solid #28a745;">
+            <div class="metric-label">Positive Sentiment</div>
+            <div class="metric-value">{}</div>
+        </div>
+        """.format(metrics['positive']), unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown("""
+        <div class="metric-box" style="border-left: 4px solid #ffc107;">
+            <div class="metric-label">Neutral Sentiment</div>
+            <div class="metric-value">{}</div>
+        </div>
+        """.format(metrics['neutral']), unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown("""
+        <div class="metric-box" style="border-left: 4px solid #dc3545;">
+            <div class="metric-label">Negative Sentiment</div>
+            <div class="metric-value">{}</div>
+        </div>
+        """.format(metrics['negative']), unsafe_allow_html=True)
+    
+    with col5:
+        st.markdown("""
+        <div class="metric-box" style="border-left: 4px solid #17a2b8;">
+            <div class="metric-label">Avg Confidence</div>
+            <div class="metric-value">{:.0f}%</div>
+        </div>
+        """.format(metrics['avg_confidence'] * 100), unsafe_allow_html=True)
+
+def render_charts(df):
+    """Render archetype and sentiment distribution charts"""
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("### 🎭 Brand Archetype Distribution")
+        st.bar_chart(distribution(df, 'archetype').set_index('Archetype'))
+    
+    with col2:
+        st.markdown("### 💭 Sentiment Breakdown")
+        st.bar_chart(distribution(df, 'sentiment').set_index('Sentiment'))
+
+def render_insights_table(page_df, total):
+    """Render one page of the Article Insights Overview table"""
+    st.markdown("### 📝 Article Insights Overview")
+    
+    st.dataframe(
+        display_frame(page_df),
+        column_config={
+            "Title": st.column_config.TextColumn("Article Title", width="large"),
+            "Source": st.column_config.TextColumn("Source", width="small"),
+            "Sentiment": st.column_config.TextColumn("Sentiment", width="small"),
+            "Confidence": st.column_config.TextColumn("Confidence", width="small"),
+            "Archetype": st.column_config.TextColumn("Archetype", width="small"),
+            "Insight": st.column_config.TextColumn("Key Insight", width="large"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        height=400
+    )
+    if total > len(page_df):
+        st.caption(f"Showing {len(page_df)} of {total} articles")
+
+def render_live_results(placeholder, df, done):
+    """Redraw banner, metrics and charts (plus a table preview while running) inside a single placeholder"""
+    with placeholder.container():
+        # SUCCESS MESSAGE - Madison Style
+        if done:
+            banner = f"✨ Madison analyzed {len(df)} articles successfully!"
+        else:
+            banner = f"⏳ Madison has analyzed {len(df)} articles so far..."
+        st.markdown(f'<div class="success-banner">{banner}</div>', unsafe_allow_html=True)
         
-        response = requests.post(
-            webhook_url,
-            json=payload,
-            timeout=900  # 15 minute timeout for n8n to process
+        render_key_metrics(df)
+        
+        # VISUALIZATIONS
+        st.markdown("---")
+        render_charts(df)
+        
+        # INSIGHTS OVERVIEW TABLE - the browser below replaces it once the job is done
+        if not done:
+            st.markdown("---")
+            render_insights_table(df.head(TABLE_PAGE_SIZE), len(df))
+
+# Seconds between job status polls while an analysis is running
+JOB_POLL_INTERVAL = 1.0
+
+# Rows per page in the overview table and articles per page in the Deep Dive
+TABLE_PAGE_SIZE = 50
+DEEP_DIVE_PAGE_SIZE = 10
+
+@st.cache_resource(max_entries=8)
+def load_job_frame(job_id, result_count):
+    """Result frame of a job, rebuilt only when new results have been recorded (read-only)"""
+    return results_frame(job_manager.store.results(job_id))
+
+@st.cache_data(max_entries=64)
+def browse_page(job_id, result_count, filters, sort_by, ascending, page, page_size):
+    """One filtered, sorted page of a job's results: (rows, page, page_count, matches)"""
+    df = load_job_frame(job_id, result_count)
+    sources, sentiments, archetypes, min_confidence = filters
+    matches = sort_frame(filter_frame(df, sources, sentiments, archetypes, min_confidence), sort_by, ascending)
+    rows, page, page_count = page_slice(matches, page, page_size)
+    return rows, page, page_count, len(matches)
+
+def render_run_info(job):
+    """Show warnings and per-run statistics recorded by a finished job"""
+    info = job['info']
+    
+    if info.get('skipped_placeholders'):
+        st.warning(f"⚠️ {info['skipped_placeholders']} articles came back without a usable analysis and were left out.")
+    for feed_url, error in info.get('feed_errors', {}).items():
+        st.warning(f"⚠️ Could not read feed {feed_url}: {error}")
+    if info.get('failed_articles'):
+        st.warning(
+            f"⚠️ {info['failed_articles']} articles could not be analyzed after retries "
+            "and were left out of the results."
+        )
+    
+    if 'scheduler' in info:
+        scheduler_stats = info['scheduler']
+        st.caption(
+            f"🚦 {scheduler_stats['requests']} OpenAI requests · {scheduler_stats['retries']} retries "
+            f"({scheduler_stats['rate_limited']} rate-limited, {scheduler_stats['server_errors']} server errors) · "
+            f"{scheduler_stats['throttled_seconds']:.1f}s throttled · {scheduler_stats['failures']} failed"
+        )
+    if 'batch' in info:
+        st.caption(
+            f"📦 {info['batch']['requests']} batched requests · "
+            f"{info['batch']['fallbacks']} articles retried individually"
+        )
+    if 'validation' in info:
+        validation = info['validation']
+        st.caption(
+            f"🧾 Response validation: {validation.get('repaired', 0)} analyses repaired, "
+            f"{validation.get('rejected', 0)} rejected, {validation.get('truncated', 0)} truncated responses (retried)"
+        )
+    if 'cache' in info:
+        cache_stats = info['cache']
+        st.caption(
+            f"🗄️ Analysis cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate) · {cache_stats['entries']} stored analyses · "
+            f"{cache_stats.get('expired', 0)} expired and {cache_stats.get('evicted', 0)} evicted after the run"
         )
+    if 'feed_stats' in info:
+        feed_stats = info['feed_stats']
+        unchanged = sum(1 for stats in feed_stats.values() if stats['not_modified'])
+        downloaded = sum(stats['bytes'] for stats in feed_stats.values())
+        st.caption(
+            f"📡 {unchanged} of {len(feed_stats)} feeds unchanged since last check · "
+            f"{downloaded / 1024:.0f} KB downloaded"
+        )
+    if 'local' in info:
+        st.caption(
+            f"⚡ {info['local']['answered']} articles answered by the local classifier "
+            f"(threshold {info['local']['threshold']:.0%}) without insights; the rest went to OpenAI"
+        )
+    if 'dedup' in info:
+        dedup_stats = info['dedup']
+        st.caption(
+            f"🧬 {dedup_stats['skipped']} near-duplicates skipped in {len(dedup_stats['clusters'])} clusters · "
+            f"{dedup_stats['reused']} cached analyses reused from cross-posts"
+        )
+        if dedup_stats['clusters']:
+            with st.expander(f"🧬 Duplicate clusters ({len(dedup_stats['clusters'])})"):
+                for cluster in dedup_stats['clusters']:
+                    primary = cluster['primary']
+                    st.markdown(f"**[{primary['title']}]({primary['link']})** · {primary['source'].replace('_', ' ').title()}")
+                    for duplicate in cluster['duplicates']:
+                        st.markdown(f"- [{duplicate['title']}]({duplicate['link']}) · {duplicate['source'].replace('_', ' ').title()}")
+
+def render_job(job):
+    """Render a job from the store: live progress while running, full dashboard once finished.
+    
+    Returns True while the job is still running so the caller keeps polling.
+    """
+    render_started = time.perf_counter()
+    params = job['params']
+    df = load_job_frame(job['id'], job['progress_done'])
+    
+    st.markdown("---")
+    
+    if st.session_state.get('job_joined'):
+        st.info("🤝 Joined an identical analysis from another session; no OpenAI calls are billed to your key.")
+    
+    if job['status'] in ('queued', 'running'):
+        if params['backend'] == N8N_BACKEND:
+            st.markdown("### 🔄 Processing Feeds via n8n...")
+        else:
+            st.markdown("### 🔄 Processing Feeds Locally...")
         
-        if response.status_code == 200:
-            return response.json()
+        expected = job['progress_total']
+        st.progress(min(len(df) / expected, 1.0) if expected else 0)
+        if job['status'] == 'queued':
+            st.text("⏳ Waiting for a free worker...")
+        elif df.empty:
+            if params['backend'] == N8N_BACKEND:
+                st.text(f"📡 Sending {len(params['feed_urls'])} feeds to n8n workflow...")
+            else:
+                st.text(f"📡 Fetching {len(params['feed_urls'])} feeds and analyzing articles ({params['concurrency']} at a time)...")
         else:
-            st.error(f"n8n webhook returned error: {response.status_code} - {response.text}")
-            return None
+            st.text(f"🧠 Analyzed {len(df)} of ~{expected} articles...")
+        
+        if not df.empty:
+            render_live_results(st.empty(), df, done=False)
+        return True
+    
+    if job['status'] == 'failed':
+        st.error(f"Error during analysis: {job['error']}")
+    
+    render_run_info(job)
+    
+    if df.empty:
+        if params['backend'] == N8N_BACKEND:
+            st.warning("⚠️ No results returned from n8n. Check your workflow output.")
+        elif params.get('only_new_posts') and not job['info'].get('feed_errors') and job['status'] == 'done':
+            st.info("✅ No new posts since the last run.")
+        else:
+            st.warning("⚠️ No articles were successfully analyzed.")
+        return False
+    
+    render_live_results(st.empty(), df, done=True)
+    
+    render_article_browser(job, df)
+    
+    # DOWNLOAD OPTIONS
+    st.markdown("---")
+    st.markdown("### 💾 Export Data")
+    render_export(
+        f"job_{job['id']}",
+        lambda fmt, path: export_job(job_manager.store, job['id'], fmt, path),
+    )
+    
+    if 'telemetry' in job['info']:
+        render_ops_panel(job, time.perf_counter() - render_started)
+    return False
+
+# README's advertised cost, used as the yardstick in the ops panel
+ADVERTISED_COST_PER_100 = 0.08
+
+def render_ops_panel(job, render_seconds):
+    """Per-stage timings, token usage and cost of a finished job, with JSON/OpenMetrics downloads"""
+    snapshot = dict(job['info']['telemetry'])
+    stages = dict(snapshot['stages'])
+    stages[RENDER] = {"count": 1, "seconds": render_seconds, "max_seconds": render_seconds, "bytes": 0}
+    snapshot['stages'] = stages
+    
+    with st.expander("🛠️ Ops: pipeline telemetry"):
+        stage_rows = [
+            {
+                'Stage': name,
+                'Count': stages[name]['count'],
+                'Total (s)': round(stages[name]['seconds'], 2),
+                'Mean (ms)': round(stages[name]['seconds'] / stages[name]['count'] * 1000, 1),
+                'Max (ms)': round(stages[name]['max_seconds'] * 1000, 1),
+                'KB': round(stages[name]['bytes'] / 1024, 1),
+            }
+            for name in STAGES if name in stages
+        ]
+        st.dataframe(pd.DataFrame(stage_rows), use_container_width=True, hide_index=True)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Prompt tokens", f"{snapshot['prompt_tokens']:,}")
+        col2.metric("Completion tokens", f"{snapshot['completion_tokens']:,}")
+        col3.metric("Estimated cost", f"${snapshot['cost_usd']:.4f}")
+        if snapshot['llm_articles']:
+            per_100 = snapshot['cost_per_llm_article_usd'] * 100
+            col4.metric(
+                "Cost per 100 articles", f"${per_100:.3f}",
+                delta=f"{per_100 - ADVERTISED_COST_PER_100:+.3f} vs ${ADVERTISED_COST_PER_100:.2f}",
+                delta_color="inverse",
+            )
+        st.caption(
+            f"{snapshot['requests']} OpenAI requests for {snapshot['llm_articles']} articles ({snapshot['model']}) · "
+            f"run took {snapshot['wall_seconds']:.1f}s · dashboard rendered in {render_seconds * 1000:.0f} ms"
+        )
+        
+        if snapshot['feeds']:
+            feed_rows = [
+                {
+                    'Feed': feed,
+                    'Articles': totals['articles'],
+                    'Fetch + parse (s)': round(totals['seconds'], 2),
+                    'KB': round(totals['bytes'] / 1024, 1),
+                    'LLM articles': totals['llm_articles'],
+                    'Tokens': totals['prompt_tokens'] + totals['completion_tokens'],
+                    'Cost ($)': round(totals['cost_usd'], 5),
+                }
+                for feed, totals in snapshot['feeds'].items()
+            ]
+            st.dataframe(pd.DataFrame(feed_rows), use_container_width=True, hide_index=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="📥 Telemetry (JSON)",
+                data=json.dumps(snapshot, indent=2),
+                file_name=f"prismly_telemetry_{job['id']}.json",
+                mime="application/json",
+                key=f"telemetry_json_{job['id']}",
+            )
+        with col2:
+            st.download_button(
+                label="📥 Telemetry (OpenMetrics)",
+                data=to_openmetrics(snapshot),
+                file_name=f"prismly_telemetry_{job['id']}.txt",
+                mime="application/openmetrics-text",
+                key=f"telemetry_om_{job['id']}",
+            )
+
+def render_deep_dive_item(item):
+    """Render one article's Deep Dive expander"""
+    with st.expander(f"📄 {item['title'][:100]}..."):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.markdown(f"**🔗 Source:** {item['source'].replace('_', ' ').title()}")
+            st.markdown(f"**📅 Published:** {item['published_at'][:10] if item['published_at'] else 'N/A'}")
+            st.markdown(f"**🔗 [Read Full Article]({item['link']})**")
             
-    except requests.exceptions.Timeout:
-        st.error("⏱️ Request timed out. n8n workflow may be taking too long. Try reducing the number of articles.")
-        return None
-    except Exception as e:
-        st.error(f"Error calling n8n webhook: {str(e)}")
-        return None
+            st.markdown("**📝 Summary:**")
+            st.info(item['summary'])
+        
+        with col2:
+            sentiment_badge_class = f"{item['sentiment']}-badge"
+            st.markdown(f"**💭 Sentiment**")
+            st.markdown(f'<span class="{sentiment_badge_class}">{item["sentiment"].upper()}</span>', unsafe_allow_html=True)
+            st.progress(item['confidence'])
+            st.caption(f"Confidence: {item['confidence']:.0%}")
+            
+            st.markdown("**🎭 Archetype**")
+            st.markdown(f"**{item['archetype']}**")
+            
+            if item['tier'] == LOCAL_TIER:
+                st.caption("⚡ Scored by the local classifier")
+        
+        st.markdown("---")
+        
+        st.markdown("**🧠 Sentiment Reasoning:**")
+        st.write(item['sentiment_reasoning'])
+        
+        st.markdown("**🎯 Archetype Reasoning:**")
+        st.write(item['archetype_reasoning'])
+        
+        st.markdown("**💡 Strategic Insight:**")
+        if item['tier'] == LOCAL_TIER:
+            st.info("No insight or recommendation: the local classifier only scores sentiment and archetype. Turn off the local pre-classifier to have OpenAI analyze every article.")
+        else:
+            st.markdown(f'<div class="insight-card"><strong>{item["insight_category"].replace("_", " ").title()}:</strong> {item["insight"]}</div>', unsafe_allow_html=True)
+            
+            st.markdown("**✅ Recommendation:**")
+            st.success(item['recommendation'])
+
+def render_article_browser(job, df):
+    """Filterable, sortable, paginated overview table and Deep Dive for a finished job.
+    
+    Only the visible page is sent to the browser; pages are memoized per job,
+    filter and sort settings.
+    """
+    st.markdown("---")
+    st.markdown("### 🔎 Browse Articles")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sources = st.multiselect(
+            "Source",
+            list(df['source'].cat.categories),
+            format_func=lambda source: source.replace('_', ' ').title(),
+            key="browse_sources"
+        )
+    with col2:
+        sentiments = st.multiselect("Sentiment", list(df['sentiment'].cat.categories), format_func=str.title, key="browse_sentiments")
+    with col3:
+        archetypes = st.multiselect("Archetype", list(df['archetype'].cat.categories), key="browse_archetypes")
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        min_confidence = st.slider("Minimum confidence", 0, 100, 0, step=5, format="%d%%", key="browse_min_confidence") / 100
+    with col2:
+        sort_by = st.selectbox("Sort by", list(SORT_COLUMNS), key="browse_sort_by")
+    with col3:
+        ascending = st.radio("Order", ["Descending", "Ascending"], horizontal=True, key="browse_order") == "Ascending"
+    
+    filters = (tuple(sources), tuple(sentiments), tuple(archetypes), min_confidence)
+    
+    # INSIGHTS OVERVIEW TABLE
+    table_page = st.number_input("Table page", min_value=1, value=1, step=1, key="browse_table_page")
+    rows, table_page, table_pages, matches = browse_page(
+        job['id'], job['progress_done'], filters, sort_by, ascending, table_page, TABLE_PAGE_SIZE
+    )
+    if not matches:
+        st.info("No articles match these filters.")
+        return
+    render_insights_table(rows, matches)
+    st.caption(f"Page {table_page} of {table_pages}")
+    
+    # DEEP DIVE SECTION
+    st.markdown("---")
+    st.markdown("### 🔍 Deep Dive Analysis")
+    
+    dive_page = st.number_input("Deep Dive page", min_value=1, value=1, step=1, key="browse_dive_page")
+    rows, dive_page, dive_pages, matches = browse_page(
+        job['id'], job['progress_done'], filters, sort_by, ascending, dive_page, DEEP_DIVE_PAGE_SIZE
+    )
+    first = (dive_page - 1) * DEEP_DIVE_PAGE_SIZE + 1
+    st.caption(f"Articles {first}–{first + len(rows) - 1} of {matches} · page {dive_page} of {dive_pages}")
+    
+    for item in rows.to_dict('records'):
+        render_deep_dive_item(item)
+
+# Labels of the export formats offered in the Export Data sections
+EXPORT_LABELS = {
+    "json": "JSON (full records)",
+    "ndjson": "NDJSON (one record per line)",
+    "csv.gz": "CSV (gzip)",
+    "parquet": "Parquet",
+}
+
+def render_export(key, write, scope=None):
+    """Format picker plus an on-demand export.
+    
+    ``write(fmt, path)`` streams the export to a file; it only runs when the
+    user asks for it, and the download button serves that file for as long
+    as format and ``scope`` (e.g. the selected window) are unchanged.
+    """
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func=EXPORT_LABELS.get, key=f"{key}_format")
+    with col2:
+        st.write("")
+        prepare = st.button("📦 Prepare export", key=f"{key}_prepare", use_container_width=True)
+    
+    if prepare:
+        path = export_path(f"brand_intelligence_{datetime.now().strftime('%Y%m%d_%H%M%S')}", fmt)
+        with st.spinner("Writing export..."):
+            st.session_state[f"{key}_export"] = (fmt, scope, write(fmt, path))
+    
+    prepared = st.session_state.get(f"{key}_export")
+    if prepared and prepared[:2] == (fmt, scope) and os.path.exists(prepared[2]):
+        path = prepared[2]
+        with open(path, "rb") as export_file:
+            st.download_button(
+                label=f"📥 Download {os.path.basename(path)} ({os.path.getsize(path) / 1024:.0f} KB)",
+                data=export_file,
+                file_name=os.path.basename(path),
+                mime=EXPORT_FORMATS[fmt][1],
+                use_container_width=True,
+                key=f"{key}_download"
+            )
+
+@st.cache_data(max_entries=1)
+def load_snapshot(modified):
+    """Scheduler snapshot rolled up per source, reloaded whenever the file changes"""
+    snapshot = SnapshotStore().load()
+    return snapshot['generated_at'], snapshot['window_days'], summarize(snapshot)
+
+def render_snapshot():
+    """Render the precomputed aggregates kept fresh by the headless scheduler"""
+    path = data_path(SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        st.info("No snapshot yet. Run `python -m prismly.scheduler schedule.json` to keep one up to date.")
+        return
+    generated_at, window_days, summary = load_snapshot(os.path.getmtime(path))
+    st.caption(
+        f"Precomputed by the scheduler · last {window_days} days · "
+        f"updated {(time.time() - generated_at) / 60:.0f} min ago"
+    )
+    if not summary:
+        st.info("The scheduler has not stored any analyses in this window yet.")
+        return
+    
+    source_rows = []
+    sentiments = {}
+    archetypes = {}
+    for source, totals in summary.items():
+        source_rows.append({
+            'Source': source,
+            'Articles': totals['articles'],
+            'Positive': totals['sentiment'].get('positive', 0),
+            'Neutral': totals['sentiment'].get('neutral', 0),
+            'Negative': totals['sentiment'].get('negative', 0),
+            'Avg Confidence': f"{totals['avg_confidence']:.0%}",
+            'Top Archetype': max(totals['archetype'], key=totals['archetype'].get) if totals['archetype'] else 'N/A',
+        })
+        for sentiment, count in totals['sentiment'].items():
+            sentiments[sentiment] = sentiments.get(sentiment, 0) + count
+        for archetype, count in totals['archetype'].items():
+            archetypes[archetype] = archetypes.get(archetype, 0) + count
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Articles", sum(row['Articles'] for row in source_rows))
+    col2.metric("Positive", sentiments.get('positive', 0))
+    col3.metric("Neutral", sentiments.get('neutral', 0))
+    col4.metric("Negative", sentiments.get('negative', 0))
+    st.dataframe(pd.DataFrame(source_rows), use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**🎭 Archetypes**")
+        st.bar_chart(pd.Series(archetypes, name='Count').sort_values(ascending=False))
+    with col2:
+        st.markdown("**💭 Sentiment**")
+        st.bar_chart(pd.Series(sentiments, name='Count'))
+    
+    for source, totals in summary.items():
+        if not totals['top_insights']:
+            continue
+        with st.expander(f"💡 Top insights: {source}"):
+            for item in totals['top_insights']:
+                st.markdown(f"**[{item['title']}]({item['link']})** · {item['category']} · {item['confidence']:.0%}")
+                st.markdown(f"{item['insight']}  \n*{item['recommendation']}*")
+
+def render_history_trends():
+    """Render sentiment/archetype trends across stored runs"""
+    result_store = ResultStore()
+    sources = result_store.sources()
+    if not sources:
+        st.info("No stored runs yet. Trends appear after your first analysis.")
+        return
+    
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
+    with col1:
+        trend_field = st.selectbox(
+            "Metric",
+            ["sentiment", "archetype", "insight_category"],
+            format_func=lambda field: field.replace('_', ' ').title()
+        )
+    with col2:
+        window_days = st.selectbox("Window", [30, 90, 180, 365], index=1, format_func=lambda days: f"Last {days} days")
+    with col3:
+        granularity = st.selectbox("Granularity", ["day", "week", "month"], index=1, format_func=str.title)
+    with col4:
+        trend_sources = st.multiselect(
+            "Sources",
+            sources,
+            default=sources,
+            format_func=lambda source: source.replace('_', ' ').title()
+        )
+    
+    trend_df = result_store.distribution(trend_field, days=window_days, freq=granularity, sources=trend_sources)
+    if trend_df.empty:
+        st.info("No stored articles in this window.")
+        return
+    
+    st.bar_chart(trend_df.groupby(['period', trend_field])['count'].sum().unstack(fill_value=0))
+    st.dataframe(
+        trend_df.pivot_table(index='source', columns=trend_field, values='count', aggfunc='sum', fill_value=0),
+        use_container_width=True
+    )
+    
+    st.markdown("**🎯 Average sentiment confidence per source**")
+    confidence_df = result_store.confidence_trend(days=window_days, freq=granularity, sources=trend_sources)
+    st.line_chart(confidence_df.pivot(index='period', columns='source', values='avg_confidence'))
+    
+    st.markdown("**💾 Export stored analyses in this window**")
+    start = date.today() - timedelta(days=window_days)
+    render_export(
+        "history",
+        lambda fmt, path: export_history(result_store, fmt, path, start=start, sources=trend_sources),
+        scope=(window_days, tuple(trend_sources)),
+    )
 
 # Process feeds
 if analyze_button:
     if not openai_api_key:
         st.error("⚠️ Please enter your OpenAI API key in the sidebar to use the analysis feature!")
-    elif not n8n_webhook_url:
+    elif analysis_backend == "n8n Workflow" and not n8n_webhook_url:
         st.error("⚠️ Please enter your n8n webhook URL in the sidebar!")
     else:
         # Get URLs based on feed mode
@@ -257,236 +947,50 @@ if analyze_button:
         if not feed_urls:
             st.error("⚠️ Please select at least one RSS feed or enter custom URLs!")
         else:
-            st.markdown("---")
-            st.markdown("### 🔄 Processing Feeds via n8n...")
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text(f"📡 Sending {len(feed_urls)} feeds to n8n workflow...")
-            progress_bar.progress(0.3)
-            
-            # Call n8n webhook with API key
-            result_data = call_n8n_webhook(n8n_webhook_url, feed_urls, max_articles, openai_api_key)
-            
-            if result_data:
-                progress_bar.progress(1.0)
-                status_text.text("✅ Analysis complete!")
-                
-                # Parse results from n8n - handle [{data: [...]}] structure
-                all_results = []
-                
-                if isinstance(result_data, list) and len(result_data) > 0:
-                    if isinstance(result_data[0], dict) and 'data' in result_data[0]:
-                        # n8n webhook response format: [{data: [...]}]
-                        all_results = result_data[0]['data']
-                    else:
-                        all_results = result_data
-                elif isinstance(result_data, dict) and 'data' in result_data:
-                    all_results = result_data['data']
-                
-                if not all_results:
-                    st.warning("⚠️ No results returned from n8n. Check your workflow output.")
-                else:
-                    time.sleep(1)
-                    status_text.empty()
-                    progress_bar.empty()
-                    
-                    # SUCCESS MESSAGE - Madison Style
-                    st.markdown(
-                        f'<div class="success-banner">✨ Madison analyzed {len(all_results)} articles successfully!</div>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Parse and flatten data
-                    parsed_data = []
-                    for article in all_results:
-                        ai_analysis = article.get('ai_analysis', {})
-                        sentiment_obj = ai_analysis.get('sentiment', {})
-                        archetype_obj = ai_analysis.get('archetype', {})
-                        insights = ai_analysis.get('insights', [])
-                        
-                        parsed_data.append({
-                            'title': article.get('title', 'N/A'),
-                            'link': article.get('link', ''),
-                            'source': article.get('source', 'N/A'),
-                            'published_at': article.get('published_at', ''),
-                            'summary': article.get('summary', '')[:200] + '...',
-                            'sentiment': sentiment_obj.get('classification', 'neutral'),
-                            'confidence': sentiment_obj.get('confidence', 0),
-                            'sentiment_reasoning': sentiment_obj.get('reasoning', ''),
-                            'archetype': archetype_obj.get('primary', 'Unknown'),
-                            'archetype_reasoning': archetype_obj.get('reasoning', ''),
-                            'insight_category': insights[0].get('category', 'N/A') if insights else 'N/A',
-                            'insight': insights[0].get('insight', 'N/A') if insights else 'N/A',
-                            'recommendation': insights[0].get('recommendation', 'N/A') if insights else 'N/A'
-                        })
-                    
-                    # Calculate metrics
-                    sentiments = Counter([d['sentiment'] for d in parsed_data])
-                    archetypes = Counter([d['archetype'] for d in parsed_data])
-                    avg_confidence = sum([d['confidence'] for d in parsed_data]) / len(parsed_data)
-                    
-                    # KEY METRICS - Madison Style
-                    st.markdown("### 📊 Key Metrics")
-                    col1, col2, col3, col4, col5 = st.columns(5)
-                    
-                    with col1:
-                        st.markdown("""
-                        <div class="metric-box">
-                            <div class="metric-label">Total Articles</div>
-                            <div class="metric-value">{}</div>
-                        </div>
-                        """.format(len(parsed_data)), unsafe_allow_html=True)
-                    
-                    with col2:
-                        st.markdown("""
-                        <div class="metric-box" style="border-left: 4px solid #28a745;">
-                            <div class="metric-label">Positive Sentiment</div>
-                            <div class="metric-value">{}</div>
-                        </div>
-                        """.format(sentiments.get('positive', 0)), unsafe_allow_html=True)
-                    
-                    with col3:
-                        st.markdown("""
-                        <div class="metric-box" style="border-left: 4px solid #ffc107;">
-                            <div class="metric-label">Neutral Sentiment</div>
-                            <div class="metric-value">{}</div>
-                        </div>
-                        """.format(sentiments.get('neutral', 0)), unsafe_allow_html=True)
-                    
-                    with col4:
-                        st.markdown("""
-                        <div class="metric-box" style="border-left: 4px solid #dc3545;">
-                            <div class="metric-label">Negative Sentiment</div>
-                            <div class="metric-value">{}</div>
-                        </div>
-                        """.format(sentiments.get('negative', 0)), unsafe_allow_html=True)
-                    
-                    with col5:
-                        st.markdown("""
-                        <div class="metric-box" style="border-left: 4px solid #17a2b8;">
-                            <div class="metric-label">Avg Confidence</div>
-                            <div class="metric-value">{:.0f}%</div>
-                        </div>
-                        """.format(avg_confidence * 100), unsafe_allow_html=True)
-                    
-                    # VISUALIZATIONS
-                    st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.markdown("### 🎭 Brand Archetype Distribution")
-                        archetype_df = pd.DataFrame(
-                            list(archetypes.items()),
-                            columns=['Archetype', 'Count']
-                        ).sort_values('Count', ascending=False)
-                        st.bar_chart(archetype_df.set_index('Archetype'))
-                    
-                    with col2:
-                        st.markdown("### 💭 Sentiment Breakdown")
-                        sentiment_df = pd.DataFrame(
-                            list(sentiments.items()),
-                            columns=['Sentiment', 'Count']
-                        )
-                        st.bar_chart(sentiment_df.set_index('Sentiment'))
-                    
-                    # INSIGHTS OVERVIEW TABLE
-                    st.markdown("---")
-                    st.markdown("### 📝 Article Insights Overview")
-                    
-                    df = pd.DataFrame(parsed_data)
-                    display_df = pd.DataFrame({
-                        'Title': df['title'].apply(lambda x: x[:60] + '...' if len(x) > 60 else x),
-                        'Source': df['source'].str.replace('_', ' ').str.title(),
-                        'Sentiment': df['sentiment'].str.capitalize(),
-                        'Confidence': df['confidence'].apply(lambda x: f"{x:.0%}"),
-                        'Archetype': df['archetype'],
-                        'Insight': df['insight'].apply(lambda x: x[:80] + '...' if len(x) > 80 else x),
-                    })
-                    
-                    st.dataframe(
-                        display_df,
-                        column_config={
-                            "Title": st.column_config.TextColumn("Article Title", width="large"),
-                            "Source": st.column_config.TextColumn("Source", width="small"),
-                            "Sentiment": st.column_config.TextColumn("Sentiment", width="small"),
-                            "Confidence": st.column_config.TextColumn("Confidence", width="small"),
-                            "Archetype": st.column_config.TextColumn("Archetype", width="small"),
-                            "Insight": st.column_config.TextColumn("Key Insight", width="large"),
-                        },
-                        hide_index=True,
-                        use_container_width=True,
-                        height=400
-                    )
-                    
-                    # DEEP DIVE SECTION
-                    st.markdown("---")
-                    st.markdown("### 🔍 Deep Dive Analysis")
-                    
-                    for idx, item in enumerate(parsed_data[:10]):
-                        with st.expander(f"📄 {item['title'][:100]}..."):
-                            col1, col2 = st.columns([2, 1])
-                            
-                            with col1:
-                                st.markdown(f"**🔗 Source:** {item['source'].replace('_', ' ').title()}")
-                                st.markdown(f"**📅 Published:** {item['published_at'][:10] if item['published_at'] else 'N/A'}")
-                                st.markdown(f"**🔗 [Read Full Article]({item['link']})**")
-                                
-                                st.markdown("**📝 Summary:**")
-                                st.info(item['summary'])
-                            
-                            with col2:
-                                sentiment_badge_class = f"{item['sentiment']}-badge"
-                                st.markdown(f"**💭 Sentiment**")
-                                st.markdown(f'<span class="{sentiment_badge_class}">{item["sentiment"].upper()}</span>', unsafe_allow_html=True)
-                                st.progress(item['confidence'])
-                                st.caption(f"Confidence: {item['confidence']:.0%}")
-                                
-                                st.markdown("**🎭 Archetype**")
-                                st.markdown(f"**{item['archetype']}**")
-                            
-                            st.markdown("---")
-                            
-                            st.markdown("**🧠 Sentiment Reasoning:**")
-                            st.write(item['sentiment_reasoning'])
-                            
-                            st.markdown("**🎯 Archetype Reasoning:**")
-                            st.write(item['archetype_reasoning'])
-                            
-                            st.markdown("**💡 Strategic Insight:**")
-                            st.markdown(f'<div class="insight-card"><strong>{item["insight_category"].replace("_", " ").title()}:</strong> {item["insight"]}</div>', unsafe_allow_html=True)
-                            
-                            st.markdown("**✅ Recommendation:**")
-                            st.success(item['recommendation'])
-                    
-                    # DOWNLOAD OPTIONS
-                    st.markdown("---")
-                    st.markdown("### 💾 Export Data")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        json_data = json.dumps(all_results, indent=2)
-                        st.download_button(
-                            label="📥 Download Full JSON Dataset",
-                            data=json_data,
-                            file_name=f"brand_intelligence_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                            mime="application/json",
-                            use_container_width=True
-                        )
-                    
-                    with col2:
-                        csv_data = df.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download CSV Report",
-                            data=csv_data,
-                            file_name=f"brand_intelligence_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv",
-                            use_container_width=True
-                        )
+            # Queue the analysis; results are rendered from the job store below
+            job_params = {
+                "feed_urls": feed_urls,
+                "max_articles": max_articles,
+            }
+            if analysis_backend == "Local Engine":
+                job_params.update({
+                    "backend": LOCAL_BACKEND,
+                    "concurrency": concurrency,
+                    "batch_token_budget": batch_token_budget if batch_requests else 0,
+                    "use_cache": use_cache,
+                    "cache_ttl": cache_ttl_days * 24 * 3600,
+                    "only_new_posts": only_new_posts,
+                    "dedup": skip_duplicates,
+                    "local_classifier": use_local_classifier,
+                    "local_threshold": local_threshold,
+                    "structured_output": structured_output,
+                })
             else:
-                st.warning("⚠️ No articles were successfully analyzed.")
+                job_params.update({
+                    "backend": N8N_BACKEND,
+                    "webhook_url": n8n_webhook_url,
+                })
+            st.session_state['job_id'], st.session_state['job_joined'] = job_manager.submit(
+                openai_api_key, job_params, share=share_runs
+            )
+
+# Show the current session's job (running or finished) on every rerun
+job_running = False
+if st.session_state.get('job_id'):
+    current_job = job_manager.store.get(st.session_state['job_id'])
+    if current_job is not None:
+        job_running = render_job(current_job)
+
+# SCHEDULED SNAPSHOT - precomputed aggregates, no history scan on page load
+st.markdown("---")
+st.markdown("### 🕒 Monitoring Snapshot")
+render_snapshot()
+
+# HISTORICAL TRENDS - read from the Parquet history, not the current run
+st.markdown("---")
+st.markdown("### 📈 Historical Trends")
+if st.checkbox("Show trends across past runs", value=False):
+    render_history_trends()
 
 # Footer
 st.markdown("""
@@ -496,3 +1000,8 @@ st.markdown("""
     <p>MyclineShareena | Northeastern University | Spring 2026</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Poll the job store until the current job (or classifier training) finishes; widget interactions simply rerun into the same job
+if job_running or training_running:
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
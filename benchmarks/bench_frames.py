@@ -0,0 +1,161 @@
+"""Benchmark the dashboard's post-response path on synthetic result sets.
+
+Compares the original per-article loop (Counter, sum(), row-wise .apply)
+with the vectorized helpers in prismly.frames.
+
+    python benchmarks/bench_frames.py --sizes 10000 50000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prismly.analysis import ARCHETYPES, INSIGHT_CATEGORIES, SENTIMENTS  # noqa: E402
+from prismly.frames import display_frame, distribution, key_metrics, results_frame  # noqa: E402
+
+SOURCES = ["azure_blog", "openai_blog", "google_ai_blog", "google_dev_blog", "microsoft_dev_blog"]
+
+
+def synthetic_records(count, seed=7):
+    """Records shaped like engine/n8n output, with some sparse analyses"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        insights = []
+        if rng.random() > 0.1:
+            insights.append({
+                "category": rng.choice(INSIGHT_CATEGORIES),
+                "insight": "Finding " * rng.randint(2, 20),
+                "recommendation": "Do something about it.",
+            })
+        records.append({
+            "title": f"Article {i} " + "word " * rng.randint(3, 20),
+            "link": f"https://example.com/{i}",
+            "source": rng.choice(SOURCES),
+            "published_at": "2026-10-01T10:00:00Z",
+            "summary": "Summary text " * rng.randint(5, 40),
+            "ai_analysis": {
+                "sentiment": {
+                    "classification": rng.choice(SENTIMENTS),
+                    "confidence": round(rng.random(), 2),
+                    "reasoning": "Because.",
+                },
+                "archetype": {"primary": rng.choice(ARCHETYPES), "reasoning": "Fits."},
+                "insights": insights,
+            },
+        })
+    return records
+
+
+def legacy_flatten(records):
+    """The original app.py implementation, kept here as the baseline.
+
+    Includes the ``pd.DataFrame`` call so the stage matches results_frame,
+    which also returns a frame.
+    """
+    parsed_data = []
+    for article in records:
+        ai_analysis = article.get('ai_analysis', {})
+        sentiment_obj = ai_analysis.get('sentiment', {})
+        archetype_obj = ai_analysis.get('archetype', {})
+        insights = ai_analysis.get('insights', [])
+        parsed_data.append({
+            'title': article.get('title', 'N/A'),
+            'link': article.get('link', ''),
+            'source': article.get('source', 'N/A'),
+            'published_at': article.get('published_at', ''),
+            'summary': article.get('summary', '')[:200] + '...',
+            'sentiment': sentiment_obj.get('classification', 'neutral'),
+            'confidence': sentiment_obj.get('confidence', 0),
+            'sentiment_reasoning': sentiment_obj.get('reasoning', ''),
+            'archetype': archetype_obj.get('primary', 'Unknown'),
+            'archetype_reasoning': archetype_obj.get('reasoning', ''),
+            'insight_category': insights[0].get('category', 'N/A') if insights else 'N/A',
+            'insight': insights[0].get('insight', 'N/A') if insights else 'N/A',
+            'recommendation': insights[0].get('recommendation', 'N/A') if insights else 'N/A'
+        })
+    return parsed_data, pd.DataFrame(parsed_data)
+
+
+def legacy_metrics(flattened):
+    parsed_data, _ = flattened
+    sentiments = Counter([d['sentiment'] for d in parsed_data])
+    archetypes = Counter([d['archetype'] for d in parsed_data])
+    avg_confidence = sum([d['confidence'] for d in parsed_data]) / len(parsed_data)
+    pd.DataFrame(list(archetypes.items()), columns=['Archetype', 'Count']).sort_values('Count', ascending=False)
+    pd.DataFrame(list(sentiments.items()), columns=['Sentiment', 'Count'])
+    return avg_confidence
+
+
+def legacy_table(flattened):
+    _, df = flattened
+    return pd.DataFrame({
+        'Title': df['title'].apply(lambda x: x[:60] + '...' if len(x) > 60 else x),
+        'Source': df['source'].str.replace('_', ' ').str.title(),
+        'Sentiment': df['sentiment'].str.capitalize(),
+        'Confidence': df['confidence'].apply(lambda x: f"{x:.0%}"),
+        'Archetype': df['archetype'],
+        'Insight': df['insight'].apply(lambda x: x[:80] + '...' if len(x) > 80 else x),
+    })
+
+
+def frames_metrics(frame):
+    metrics = key_metrics(frame)
+    distribution(frame, "archetype")
+    distribution(frame, "sentiment")
+    return metrics["avg_confidence"]
+
+
+def timed(fn, arg, repeat):
+    """Best-of-``repeat`` wall time of fn(arg), and its last result"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench(records, repeat):
+    """Seconds per stage for both implementations"""
+    legacy = {}
+    legacy["flatten"], parsed = timed(legacy_flatten, records, repeat)
+    legacy["metrics"], _ = timed(legacy_metrics, parsed, repeat)
+    legacy["table"], _ = timed(legacy_table, parsed, repeat)
+
+    vectorized = {}
+    vectorized["flatten"], frame = timed(results_frame, records, repeat)
+    vectorized["metrics"], _ = timed(frames_metrics, frame, repeat)
+    vectorized["table"], _ = timed(display_frame, frame, repeat)
+    return legacy, vectorized
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    stages = ("flatten", "metrics", "table")
+    print(f"{'articles':>9} {'stage':>8} {'legacy (s)':>11} {'frames (s)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        records = synthetic_records(size)
+        legacy, vectorized = bench(records, args.repeat)
+        legacy["total"] = sum(legacy[stage] for stage in stages)
+        vectorized["total"] = sum(vectorized[stage] for stage in stages)
+        for stage in stages + ("total",):
+            print(
+                f"{size:>9} {stage:>8} {legacy[stage]:>11.3f} {vectorized[stage]:>11.3f}"
+                f" {legacy[stage] / vectorized[stage]:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""End-to-end throughput benchmark against local mock feeds and a mock OpenAI API.
+
+Starts benchmarks/mock_services.py in-process and runs the local analysis
+engine over synthetic feeds, storing every record in a JobStore the way a
+background job does. The stored results then go through the dashboard's
+result path (result frame, key metrics, chart distributions, filtered and
+sorted table page). Nothing leaves 127.0.0.1 and no API key is needed.
+
+Reported per scenario: articles/sec, p50/p95 time from run start to each
+result, p50/p95 chat-request latency, mock endpoint counts (500s, 429s),
+and peak traced Python memory. ``--json`` writes the numbers for
+``--compare`` on a later run.
+
+    python benchmarks/bench_pipeline.py --feeds 5 --articles 50 --latency 0.3
+    python benchmarks/bench_pipeline.py --error-rate 0.05 --rpm 120 --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep caches, stores and indexes of benchmark runs out of the real data directory
+os.environ.setdefault("PRISMLY_DATA_DIR", tempfile.mkdtemp(prefix="prismly-bench-"))
+
+import prismly.analysis  # noqa: E402
+from mock_services import MockServices  # noqa: E402
+from prismly.engine import DEFAULT_BATCH_TOKEN_BUDGET, DEFAULT_CONCURRENCY, AnalysisEngine  # noqa: E402
+from prismly.frames import (  # noqa: E402
+    display_frame, distribution, filter_frame, key_metrics, page_slice, results_frame, sort_frame
+)
+from prismly.jobs import JobStore  # noqa: E402
+from prismly.ratelimit import RateLimiter, RetryScheduler  # noqa: E402
+
+TABLE_PAGE_SIZE = 50
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+class TimedScheduler(RetryScheduler):
+    """RetryScheduler that also records the round-trip time of every HTTP attempt"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def call(self, send, tokens=0):
+        def timed_send():
+            started = time.perf_counter()
+            try:
+                return send()
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+
+        return super().call(timed_send, tokens)
+
+
+def run_pipeline(services, args, store):
+    """Analyze every mock feed once; returns (job_id, metrics)"""
+    feed_urls = [
+        services.feed_url(f"feed{i}", args.articles, kind="atom" if i % 2 else "rss")
+        for i in range(args.feeds)
+    ]
+    scheduler = TimedScheduler(limiter=RateLimiter(rpm=args.client_rpm, tpm=args.client_tpm))
+    engine = AnalysisEngine(
+        "sk-benchmark",
+        concurrency=args.concurrency,
+        batch_token_budget=args.batch_token_budget,
+        scheduler=scheduler,
+        structured_output=not args.no_structured,
+    )
+    job_id = store.create({"backend": "benchmark", "feed_urls": feed_urls, "max_articles": args.articles})
+    started = time.perf_counter()
+    arrivals = []
+    for seq, record in enumerate(engine.iter_results(feed_urls, args.articles)):
+        arrivals.append(time.perf_counter() - started)
+        store.append_result(job_id, seq, record, len(feed_urls) * args.articles)
+    elapsed = time.perf_counter() - started
+    telemetry = engine.telemetry.snapshot()
+    store.finish(job_id, {"telemetry": telemetry})
+
+    return job_id, {
+        "articles": len(arrivals),
+        "failed_articles": len(engine.failed_articles),
+        "feed_errors": len(engine.feed_errors),
+        "seconds": elapsed,
+        "articles_per_sec": len(arrivals) / elapsed if elapsed else 0.0,
+        "result_p50_s": percentile(arrivals, 0.5) if arrivals else None,
+        "result_p95_s": percentile(arrivals, 0.95) if arrivals else None,
+        "request_p50_s": percentile(scheduler.latencies, 0.5) if scheduler.latencies else None,
+        "request_p95_s": percentile(scheduler.latencies, 0.95) if scheduler.latencies else None,
+        "scheduler": scheduler.stats(),
+        "prompt_tokens": telemetry["prompt_tokens"],
+        "completion_tokens": telemetry["completion_tokens"],
+        "validation": dict(engine.validation),
+    }
+
+
+def run_dashboard(store, job_id, repeat=1):
+    """Run app.py's post-response path on a stored job; returns timings in seconds"""
+    timings = {}
+    started = time.perf_counter()
+    records = store.results(job_id) * repeat
+    timings["load"] = time.perf_counter() - started
+
+    stage = time.perf_counter()
+    frame = results_frame(records)
+    timings["frame"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    key_metrics(frame)
+    distribution(frame, "archetype")
+    distribution(frame, "sentiment")
+    timings["metrics"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    rows = filter_frame(frame, min_confidence=0.6)
+    rows = sort_frame(rows, "Confidence", ascending=False)
+    page_rows, _, _ = page_slice(rows, 1, TABLE_PAGE_SIZE)
+    display_frame(page_rows)
+    timings["table"] = time.perf_counter() - stage
+
+    timings["total"] = time.perf_counter() - started
+    timings["rows"] = len(frame)
+    return timings
+
+
+def measure(args):
+    services = MockServices(args.latency, args.jitter, args.error_rate, args.rpm, seed=args.seed).start()
+    # The engine reads the endpoint from this module attribute on every request
+    prismly.analysis.OPENAI_CHAT_URL = services.chat_url
+    store = JobStore()
+    try:
+        tracemalloc.start()
+        job_id, pipeline = run_pipeline(services, args, store)
+        pipeline["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.reset_peak()
+        dashboard = run_dashboard(store, job_id, args.dashboard_repeat)
+        dashboard["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        return {"config": vars(args).copy(), "pipeline": pipeline, "mock": services.stats(), "dashboard": dashboard}
+    finally:
+        services.stop()
+
+
+REPORT_ROWS = [
+    ("articles", "pipeline.articles"),
+    ("failed articles", "pipeline.failed_articles"),
+    ("wall time (s)", "pipeline.seconds"),
+    ("articles/sec", "pipeline.articles_per_sec"),
+    ("result p50 (s)", "pipeline.result_p50_s"),
+    ("result p95 (s)", "pipeline.result_p95_s"),
+    ("request p50 (s)", "pipeline.request_p50_s"),
+    ("request p95 (s)", "pipeline.request_p95_s"),
+    ("pipeline peak memory (MB)", "pipeline.peak_memory_mb"),
+    ("prompt tokens", "pipeline.prompt_tokens"),
+    ("completion tokens", "pipeline.completion_tokens"),
+    ("analyses repaired", "pipeline.validation.repaired"),
+    ("chat requests seen", "mock.chat_requests"),
+    ("500s served", "mock.server_errors"),
+    ("429s served", "mock.rate_limited"),
+    ("client retries", "pipeline.scheduler.retries"),
+    ("throttled (s)", "pipeline.scheduler.throttled_seconds"),
+    ("dashboard rows", "dashboard.rows"),
+    ("dashboard total (s)", "dashboard.total"),
+    ("dashboard peak memory (MB)", "dashboard.peak_memory_mb"),
+]
+
+
+def flatten(result, prefix=""):
+    """Yield (dotted.key, value) pairs of a nested result dict"""
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def report(result, baseline=None):
+    """Print the result table, with relative change against a baseline if given"""
+    values = dict(flatten(result))
+    before = dict(flatten(baseline)) if baseline else {}
+    print(f"{'metric':<28}{'value':>12}" + (f"{'baseline':>12}{'change':>10}" if baseline else ""))
+    for label, key in REPORT_ROWS:
+        line = f"{label:<28}{_fmt(values.get(key)):>12}"
+        if baseline:
+            line += f"{_fmt(before.get(key)):>12}"
+            if before.get(key) and values.get(key) is not None:
+                line += f"{(values[key] - before[key]) / before[key]:>+10.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--feeds", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=50, help="articles per feed")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--batch-token-budget", type=int, default=DEFAULT_BATCH_TOKEN_BUDGET,
+                        help="0 sends one request per article")
+    parser.add_argument("--no-structured", action="store_true",
+                        help="send the verbose prompt without a response schema")
+    parser.add_argument("--latency", type=float, default=0.3, help="mean mock chat latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="std dev of mock chat latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of chat requests failing with 500")
+    parser.add_argument("--rpm", type=int, default=0, help="mock requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--client-rpm", type=int, default=10000, help="engine's starting request budget")
+    parser.add_argument("--client-tpm", type=int, default=10_000_000, help="engine's starting token budget")
+    parser.add_argument("--dashboard-repeat", type=int, default=1,
+                        help="replicate stored results N times for the dashboard stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    args = parser.parse_args()
+
+    result = measure(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fileobj:
+            baseline = json.load(fileobj)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as fileobj:
+            json.dump(result, fileobj, indent=2)
+
+
+if __name__ == "__main__":
+    main()
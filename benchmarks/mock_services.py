@@ -0,0 +1,290 @@
+"""Local stand-ins for RSS/Atom hosts and the OpenAI chat-completions API.
+
+One threaded HTTP server on 127.0.0.1 serves both:
+
+    GET  /feeds/<name>.rss?n=50    synthetic RSS 2.0 feed with n items
+    GET  /feeds/<name>.atom?n=50   synthetic Atom feed with n entries
+    POST /v1/chat/completions      fake gpt-4o-mini answering single and batch prompts,
+                                   with or without a json_schema response_format
+
+Feed content is derived from the feed name, so every run serves the same
+articles. The chat endpoint sleeps for a configurable latency, fails a share
+of requests with 500s and enforces a requests-per-minute window with 429s
+and OpenAI-style x-ratelimit-* headers.
+
+Run it standalone to point the Streamlit app at it:
+
+    python benchmarks/mock_services.py --port 8765 --latency 0.5 --error-rate 0.02
+    PRISMLY_OPENAI_URL=http://127.0.0.1:8765/v1/chat/completions streamlit run app.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prismly.analysis import ARCHETYPES, INSIGHT_CATEGORIES, SENTIMENTS  # noqa: E402
+
+DEFAULT_FEED_SIZE = 50
+
+WORDS = (
+    "cloud model agent platform developer release security latency pricing partner customer research "
+    "launch preview benchmark inference training dataset compliance outage migration api sdk open "
+    "source enterprise startup growth revenue regulation privacy energy chip cluster region support"
+).split()
+
+_ARTICLE_RE = re.compile(r"\*\*Article (\d+):\*\*")
+_TITLE_RE = re.compile(r"^Title: (.*)$", re.MULTILINE)
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def synthetic_items(name, count):
+    """Deterministic (title, link, published, summary) tuples for a feed"""
+    rng = random.Random(name)
+    published = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0)
+    items = []
+    for i in range(count):
+        items.append((
+            f"{_sentence(rng, rng.randint(5, 10))} ({name} #{i})",
+            f"https://{name}.example.com/posts/{i}",
+            published - timedelta(hours=6 * i),
+            " ".join(_sentence(rng, rng.randint(8, 16)) + "." for _ in range(rng.randint(2, 6))),
+        ))
+    return items
+
+
+def rss_feed(name, count):
+    items = "".join(
+        f"<item><title>{escape(title)}</title><link>{link}</link><guid>{link}</guid>"
+        f"<pubDate>{format_datetime(published)}</pubDate>"
+        f"<description>{escape('<p>' + summary + '</p>')}</description></item>"
+        for title, link, published, summary in synthetic_items(name, count)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>{items}</channel></rss>'
+
+
+def atom_feed(name, count):
+    entries = "".join(
+        f'<entry><title>{escape(title)}</title><link rel="alternate" href="{link}"/><id>{link}</id>'
+        f"<published>{published.isoformat()}</published><summary>{escape(summary)}</summary></entry>"
+        for title, link, published, summary in synthetic_items(name, count)
+    )
+    return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>{name}</title>{entries}</feed>'
+
+
+def fake_analysis(title):
+    """A plausible analysis, stable for a given article title"""
+    rng = random.Random(hashlib.blake2b(title.encode("utf-8"), digest_size=8).digest())
+    return {
+        "sentiment": {
+            "classification": rng.choice(SENTIMENTS),
+            "confidence": round(rng.uniform(0.5, 0.99), 2),
+            "reasoning": "Synthetic reasoning from the mock endpoint.",
+        },
+        "archetype": {"primary": rng.choice(ARCHETYPES), "reasoning": "Synthetic archetype reasoning."},
+        "insights": [{
+            "category": rng.choice(INSIGHT_CATEGORIES),
+            "insight": "Synthetic insight.",
+            "recommendation": "Synthetic recommendation.",
+        }],
+    }
+
+
+class MockServices:
+    """Mock feed host and chat-completions endpoint running in a background thread.
+
+    ``latency`` and ``jitter`` are seconds per chat request, ``error_rate``
+    the share of requests answered with a 500 and ``rpm`` the requests
+    accepted per rolling minute before 429s (0 disables the limit).
+    ``stats()`` counts what the endpoint saw.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, rpm=0, seed=0, port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._stats = {"feed_requests": 0, "chat_requests": 0, "ok": 0, "server_errors": 0, "rate_limited": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def chat_url(self):
+        return f"{self.base_url}/v1/chat/completions"
+
+    def feed_url(self, name, count=DEFAULT_FEED_SIZE, kind="rss"):
+        return f"{self.base_url}/feeds/{name}.{kind}?n={count}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+            self._window.clear()
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _admit(self):
+        """Decide one chat request's fate: (status, delay, rate-limit headers)"""
+        with self._lock:
+            self._stats["chat_requests"] += 1
+            now = time.monotonic()
+            headers = {}
+            if self.rpm:
+                while self._window and now - self._window[0] >= 60:
+                    self._window.popleft()
+                if len(self._window) >= self.rpm:
+                    reset = 60 - (now - self._window[0])
+                    self._stats["rate_limited"] += 1
+                    return 429, 0.0, {"retry-after-ms": str(int(reset * 1000))}
+                self._window.append(now)
+                headers = {
+                    "x-ratelimit-limit-requests": str(self.rpm),
+                    "x-ratelimit-remaining-requests": str(self.rpm - len(self._window)),
+                    "x-ratelimit-reset-requests": f"{60 - (now - self._window[0]):.3f}s",
+                }
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+            if self._rng.random() < self.error_rate:
+                self._stats["server_errors"] += 1
+                return 500, delay, headers
+            self._stats["ok"] += 1
+            return 200, delay, headers
+
+    def _completion(self, body):
+        prompt = body["messages"][-1]["content"]
+        titles = _TITLE_RE.findall(prompt)
+        ids = _ARTICLE_RE.findall(prompt)
+        if ids:
+            content = {"results": [dict(fake_analysis(title), id=int(i)) for i, title in zip(ids, titles)]}
+        else:
+            content = fake_analysis(titles[0] if titles else prompt)
+        text = json.dumps(content)
+        finish_reason = "stop"
+        # Like the real API: output stops at max_tokens, and a response schema counts as prompt
+        if body.get("max_tokens") and len(text) // 4 > body["max_tokens"]:
+            text = text[:body["max_tokens"] * 4]
+            finish_reason = "length"
+        prompt_tokens = len(prompt) // 4
+        if body.get("response_format"):
+            prompt_tokens += len(json.dumps(body["response_format"])) // 4
+        return {
+            "choices": [{"message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4},
+        }
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, content_type, headers=None):
+                data = payload.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                match = re.fullmatch(r"/feeds/([\w.-]+)\.(rss|atom)", parts.path)
+                if not match:
+                    self._send(404, "not found", "text/plain")
+                    return
+                services._count("feed_requests")
+                name, kind = match.groups()
+                count = int(parse_qs(parts.query).get("n", [DEFAULT_FEED_SIZE])[0])
+                if kind == "rss":
+                    self._send(200, rss_feed(name, count), "application/rss+xml")
+                else:
+                    self._send(200, atom_feed(name, count), "application/atom+xml")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if urlsplit(self.path).path != "/v1/chat/completions":
+                    self._send(404, "not found", "text/plain")
+                    return
+                status, delay, headers = services._admit()
+                time.sleep(delay)
+                if status == 429:
+                    error = {"error": {"type": "requests", "code": "rate_limit_exceeded", "message": "Rate limit reached"}}
+                    self._send(429, json.dumps(error), "application/json", headers)
+                elif status == 500:
+                    self._send(500, json.dumps({"error": {"message": "Mock server error"}}), "application/json", headers)
+                else:
+                    self._send(200, json.dumps(services._completion(body)), "application/json", headers)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock feeds and a mock OpenAI endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="mean seconds per chat request")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of chat requests failing with 500")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    args = parser.parse_args()
+
+    services = MockServices(args.latency, args.jitter, args.error_rate, args.rpm, port=args.port).start()
+    print(f"Chat completions: {services.chat_url}")
+    print(f"Feeds:            {services.feed_url('example')}")
+    try:
+        services._thread.join()
+    except KeyboardInterrupt:
+        services.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Prismly local analysis engine."""
+
+from prismly.engine import AnalysisEngine, run_analysis
+
+__all__ = ["AnalysisEngine", "run_analysis"]
@@ -0,0 +1,553 @@
+"""OpenAI prompt construction and response parsing (ports of the n8n AI steps)."""
+
+import json
+import os
+import re
+
+# Overridable so benchmarks and tests can point the engine at a local stand-in
+OPENAI_CHAT_URL = os.environ.get("PRISMLY_OPENAI_URL", "https://api.openai.com/v1/chat/completions")
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.3
+MAX_TOKENS = 800
+# Output cap per article in structured mode, where reasoning is kept to one sentence
+STRUCTURED_MAX_TOKENS = 350
+# Article summaries are trimmed to this many tokens before they go into a prompt
+SUMMARY_TOKEN_BUDGET = 250
+OPENAI_TIMEOUT = 120  # seconds per chat completion
+# Bump whenever a prompt template or the expected output changes; invalidates cached analyses
+PROMPT_VERSION = "2"
+
+ARCHETYPES = [
+    "Hero", "Sage", "Rebel", "Creator", "Caregiver", "Magician",
+    "Explorer", "Ruler", "Innocent", "Lover", "Jester", "Everyman",
+]
+SENTIMENTS = ["positive", "neutral", "negative"]
+INSIGHT_CATEGORIES = ["market_trend", "competitive_move", "innovation", "crisis", "opportunity"]
+
+# Which stage produced a record's analysis
+LLM_TIER = "llm"
+LOCAL_TIER = "local"
+
+PROMPT_TEMPLATE = """You are a Prismly analyst specializing in competitive analysis and brand positioning.
+
+Analyze the following article and provide a comprehensive brand analysis assessment:
+
+**Article Details:**
+Title: {title}
+Summary: {summary}
+Source: {source}
+
+**Your Task:**
+Based on the article content, determine:
+1. **Sentiment**: Is the overall tone positive, neutral, or negative toward the subject?
+2. **Brand Archetype**: Which brand archetype does this content align with (Hero, Sage, Rebel, Creator, Caregiver, Magician, Explorer, Ruler, Innocent, Lover, Jester, or Everyman)?
+3. **Strategic Insights**: What are the key market trends, competitive moves, or strategic implications?
+
+**Output Format:**
+Return ONLY a valid JSON object with this structure (fill in actual analyzed values, not placeholders):
+
+{{
+  "sentiment": {{
+    "classification": "positive|neutral|negative",
+    "confidence": 0.85,
+    "reasoning": "Explain why you classified it this way based on the content"
+  }},
+  "archetype": {{
+    "primary": "Hero|Sage|Rebel|Creator|Caregiver|Magician|Explorer|Ruler|Innocent|Lover|Jester|Everyman",
+    "reasoning": "Explain why this archetype fits based on the messaging and positioning"
+  }},
+  "insights": [
+    {{
+      "category": "market_trend|competitive_move|innovation|crisis|opportunity",
+      "insight": "Key finding from the article",
+      "recommendation": "Actionable recommendation based on this insight"
+    }}
+  ]
+}}
+
+Return only the JSON object, no markdown formatting or explanations outside the JSON."""
+
+BATCH_PROMPT_TEMPLATE = """You are a Prismly analyst specializing in competitive analysis and brand positioning.
+
+Analyze EACH of the following {count} articles independently and provide a brand analysis assessment for every one:
+
+{articles}
+
+**Your Task:**
+For each article, based on its content, determine:
+1. **Sentiment**: Is the overall tone positive, neutral, or negative toward the subject?
+2. **Brand Archetype**: Which brand archetype does this content align with (Hero, Sage, Rebel, Creator, Caregiver, Magician, Explorer, Ruler, Innocent, Lover, Jester, or Everyman)?
+3. **Strategic Insights**: What are the key market trends, competitive moves, or strategic implications?
+
+**Output Format:**
+Return ONLY a valid JSON object with a "results" array holding exactly one entry per article, using the article's number as "id" (fill in actual analyzed values, not placeholders):
+
+{{
+  "results": [
+    {{
+      "id": 1,
+      "sentiment": {{
+        "classification": "positive|neutral|negative",
+        "confidence": 0.85,
+        "reasoning": "Explain why you classified it this way based on the content"
+      }},
+      "archetype": {{
+        "primary": "Hero|Sage|Rebel|Creator|Caregiver|Magician|Explorer|Ruler|Innocent|Lover|Jester|Everyman",
+        "reasoning": "Explain why this archetype fits based on the messaging and positioning"
+      }},
+      "insights": [
+        {{
+          "category": "market_trend|competitive_move|innovation|crisis|opportunity",
+          "insight": "Key finding from the article",
+          "recommendation": "Actionable recommendation based on this insight"
+        }}
+      ]
+    }}
+  ]
+}}
+
+Return only the JSON object, no markdown formatting or explanations outside the JSON."""
+
+# Structured mode: the JSON schema carries the output shape and labels, so the
+# instructions only say what to judge
+COMPACT_PROMPT_TEMPLATE = """You are a Prismly analyst specializing in competitive analysis and brand positioning.
+
+For the article below, judge the overall sentiment toward its subject (with a confidence from 0 to 1), the brand archetype its messaging fits, and 1-2 strategic insights, each with an actionable recommendation. Keep every reasoning, insight and recommendation to one sentence.
+
+Title: {title}
+Summary: {summary}
+Source: {source}"""
+
+COMPACT_BATCH_PROMPT_TEMPLATE = """You are a Prismly analyst specializing in competitive analysis and brand positioning.
+
+For each of the {count} articles below, independently judge the overall sentiment toward its subject (with a confidence from 0 to 1), the brand archetype its messaging fits, and 1-2 strategic insights, each with an actionable recommendation. Keep every reasoning, insight and recommendation to one sentence. Return one result per article, using the article's number as "id".
+
+{articles}"""
+
+BATCH_ARTICLE_TEMPLATE = """**Article {id}:**
+Title: {title}
+Summary: {summary}
+Source: {source}
+"""
+
+# Rough cost of the shared batch instructions (or compact ones plus the schema), and a hard cap on batch output
+BATCH_OVERHEAD_TOKENS = 450
+MAX_BATCH_OUTPUT_TOKENS = 16000
+
+# Decoding a truncated response tries this many cut points, latest first
+MAX_REPAIR_ATTEMPTS = 20
+
+_FENCE_RE = re.compile(r"```(?:json)?\n?")
+# Approximates the GPT pre-tokenizer: contractions, words and punctuation runs
+# with their leading space, numbers in groups of up to three digits, whitespace
+_TOKEN_RE = re.compile(r"'(?:s|t|re|ve|m|ll|d)\b| ?[^\W\d_]+| ?\d{1,3}| ?(?:[^\s\w]|_)+|\s+")
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]?(?=\s|$)")
+CHARS_PER_WORD_TOKEN = 5  # long words split into several tokens
+
+
+def _object_schema(properties):
+    """Strict-mode schema object: every property required, no others allowed"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_ANALYSIS_PROPERTIES = {
+    "sentiment": _object_schema({
+        "classification": {"type": "string", "enum": SENTIMENTS},
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"},
+    }),
+    "archetype": _object_schema({
+        "primary": {"type": "string", "enum": ARCHETYPES},
+        "reasoning": {"type": "string"},
+    }),
+    "insights": {
+        "type": "array",
+        "items": _object_schema({
+            "category": {"type": "string", "enum": INSIGHT_CATEGORIES},
+            "insight": {"type": "string"},
+            "recommendation": {"type": "string"},
+        }),
+    },
+}
+ANALYSIS_SCHEMA = _object_schema(_ANALYSIS_PROPERTIES)
+BATCH_SCHEMA = _object_schema({
+    "results": {"type": "array", "items": _object_schema({"id": {"type": "integer"}, **_ANALYSIS_PROPERTIES})},
+})
+
+
+def _response_format(name, schema):
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def prompt_version(structured=False):
+    """Version tag of the prompt a mode sends; part of cache and dedup keys"""
+    return f"{PROMPT_VERSION}-structured" if structured else PROMPT_VERSION
+
+
+def _piece_tokens(piece):
+    return max(1, round(len(piece.strip()) / CHARS_PER_WORD_TOKEN))
+
+
+def count_tokens(text):
+    """Token count of ``text``, following how GPT tokenizers split words, numbers and punctuation"""
+    return sum(_piece_tokens(match.group()) for match in _TOKEN_RE.finditer(text))
+
+
+def truncate_to_tokens(text, budget):
+    """Cut ``text`` to at most ``budget`` tokens, inside a word only if no whole one fits.
+
+    Ends after the last full sentence when that keeps most of the budget,
+    otherwise after the last whole token followed by an ellipsis.
+    """
+    # Every token covers at least one character
+    if len(text) <= budget or count_tokens(text) <= budget:
+        return text
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        cost = _piece_tokens(match.group())
+        if used + cost > budget - 1:  # one token is left for the ellipsis
+            break
+        used += cost
+    kept = text[:match.start()].rstrip()
+    if not kept:
+        # A single run of letters or symbols longer than the budget
+        return match.group()[:max(0, budget - 1) * CHARS_PER_WORD_TOKEN].strip() + "…"
+    sentence_ends = [end.end() for end in _SENTENCE_END_RE.finditer(kept)]
+    if sentence_ends and sentence_ends[-1] >= 0.6 * len(kept):
+        return kept[:sentence_ends[-1]]
+    return kept + "…"
+
+
+def _prompt_fields(article):
+    return {
+        "title": article.get("title", ""),
+        "summary": truncate_to_tokens(article.get("summary", ""), SUMMARY_TOKEN_BUDGET),
+        "source": article.get("source", ""),
+    }
+
+
+def build_request_body(article, model=MODEL, structured=False):
+    """Build the chat-completions body for a single article.
+
+    ``structured`` sends the compact prompt and requests schema-conforming
+    output through ``response_format``.
+    """
+    template = COMPACT_PROMPT_TEMPLATE if structured else PROMPT_TEMPLATE
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": template.format(**_prompt_fields(article))}],
+        "temperature": TEMPERATURE,
+        "max_tokens": STRUCTURED_MAX_TOKENS if structured else MAX_TOKENS,
+    }
+    if structured:
+        body["response_format"] = _response_format("brand_analysis", ANALYSIS_SCHEMA)
+    return body
+
+
+def article_tokens(article):
+    """Estimated prompt tokens one article adds to a batch"""
+    return count_tokens(BATCH_ARTICLE_TEMPLATE.format(id=0, **_prompt_fields(article)))
+
+
+def pack_batches(articles, token_budget, max_batch_size, tokens=article_tokens):
+    """Greedily group articles so each batch prompt stays within token_budget.
+
+    ``tokens`` maps an item to its estimated prompt tokens. An article larger
+    than the budget on its own still gets a batch of one.
+    """
+    batches = []
+    current = []
+    used = BATCH_OVERHEAD_TOKENS
+    for article in articles:
+        cost = tokens(article)
+        if current and (used + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            used = BATCH_OVERHEAD_TOKENS
+        current.append(article)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_request_body(articles, model=MODEL, structured=False):
+    """Build one chat-completions body covering several articles"""
+    article_blocks = "\n".join(
+        BATCH_ARTICLE_TEMPLATE.format(id=idx, **_prompt_fields(article))
+        for idx, article in enumerate(articles, start=1)
+    )
+    template = COMPACT_BATCH_PROMPT_TEMPLATE if structured else BATCH_PROMPT_TEMPLATE
+    per_article = STRUCTURED_MAX_TOKENS if structured else MAX_TOKENS
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": template.format(count=len(articles), articles=article_blocks)}],
+        "temperature": TEMPERATURE,
+        "max_tokens": min(per_article * len(articles), MAX_BATCH_OUTPUT_TOKENS),
+    }
+    if structured:
+        body["response_format"] = _response_format("brand_analysis_batch", BATCH_SCHEMA)
+    return body
+
+
+def post_chat_completion(session, api_key, body, timeout=OPENAI_TIMEOUT):
+    """POST a chat completion and return the raw response without checking its status"""
+    return session.post(
+        OPENAI_CHAT_URL,
+        headers={"Authorization": f"Bearer {api_key}"},
+        json=body,
+        timeout=timeout,
+    )
+
+
+def request_tokens(body):
+    """Tokens a request counts against the per-minute limit: prompt, response schema and max_tokens"""
+    prompt = "".join(message["content"] for message in body["messages"])
+    if "response_format" in body:
+        prompt += json.dumps(body["response_format"])
+    return count_tokens(prompt) + body.get("max_tokens", 0)
+
+
+def error_analysis(reason="Parse error"):
+    """Placeholder analysis used when the model output cannot be used"""
+    return {
+        "sentiment": {"classification": "unknown", "confidence": 0, "reasoning": reason},
+        "archetype": {"primary": "Unknown", "reasoning": reason},
+        "insights": [],
+    }
+
+
+def is_error_analysis(ai_analysis):
+    """True for placeholders produced by error_analysis()"""
+    sentiment = ai_analysis.get("sentiment", {})
+    return sentiment.get("classification") == "unknown" and not sentiment.get("confidence")
+
+
+def _close_truncated(text):
+    """Decode JSON cut off mid-document by closing it after its last complete value"""
+    closers = []
+    cuts = []  # (position, closing brackets) after each complete value
+    in_string = escaped = False
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not closers:
+                break
+            closers.pop()
+            cuts.append((position + 1, "".join(reversed(closers))))
+        elif char == "," and closers:
+            cuts.append((position, "".join(reversed(closers))))
+    for position, closing in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        try:
+            return json.loads(text[:position] + closing)
+        except ValueError:
+            continue
+    return None
+
+
+def decode_model_json(content, truncated=False):
+    """Decode a model's JSON answer; None if nothing usable is in it.
+
+    Code fences and prose around the JSON are ignored. With ``truncated``
+    (output cut off by the token limit) everything up to the last complete
+    value is kept.
+    """
+    text = _FENCE_RE.sub("", content or "").strip()
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(text, min(starts))[0]
+    except ValueError:
+        return _close_truncated(text[min(starts):]) if truncated else None
+
+
+def _choice(value, options):
+    """The option ``value`` names, ignoring case, spaces and hyphens; None if none"""
+    if not isinstance(value, str):
+        return None
+    normalized = value.strip().lower().replace(" ", "_").replace("-", "_")
+    for option in options:
+        if option.lower() == normalized:
+            return option
+    return None
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def validate_analysis(data):
+    """Check one model-produced analysis against the schema, keeping what is valid.
+
+    Returns (analysis, issues), where issues names every field that had to
+    be repaired or dropped. Labels are matched ignoring case. A missing or
+    unknown sentiment, confidence or archetype makes the analysis None. A
+    confidence given as a percentage is rescaled and any other outside 0-1
+    clamped, and insights without text or with an unknown category are
+    dropped. Repaired analyses are as usable as any other; ``issues`` is
+    only for reporting and is not part of the analysis.
+    """
+    if not isinstance(data, dict):
+        return None, ["analysis"]
+    sentiment = data.get("sentiment") if isinstance(data.get("sentiment"), dict) else {}
+    classification = _choice(sentiment.get("classification"), SENTIMENTS)
+    if classification is None:
+        return None, ["sentiment.classification"]
+    try:
+        confidence = float(sentiment.get("confidence"))
+    except (TypeError, ValueError):
+        confidence = float("nan")
+    if confidence != confidence:
+        return None, ["sentiment.confidence"]
+    archetype = data.get("archetype") if isinstance(data.get("archetype"), dict) else {}
+    primary = _choice(archetype.get("primary"), ARCHETYPES)
+    if primary is None:
+        return None, ["archetype.primary"]
+
+    issues = []
+    if not 0 <= confidence <= 1:
+        issues.append("sentiment.confidence")
+        confidence = confidence / 100 if 1 < confidence <= 100 else min(1.0, max(0.0, confidence))
+
+    insights = []
+    raw_insights = data.get("insights") if isinstance(data.get("insights"), list) else []
+    if not isinstance(data.get("insights"), list):
+        issues.append("insights")
+    for index, item in enumerate(raw_insights):
+        item = item if isinstance(item, dict) else {}
+        category = _choice(item.get("category"), INSIGHT_CATEGORIES)
+        if category is None or not _text(item.get("insight")):
+            issues.append(f"insights[{index}]")
+            continue
+        insights.append({
+            "category": category,
+            "insight": _text(item.get("insight")),
+            "recommendation": _text(item.get("recommendation")),
+        })
+
+    analysis = {
+        "sentiment": {
+            "classification": classification,
+            "confidence": confidence,
+            "reasoning": _text(sentiment.get("reasoning")),
+        },
+        "archetype": {"primary": primary, "reasoning": _text(archetype.get("reasoning"))},
+        "insights": insights,
+    }
+    return analysis, issues
+
+
+def _validated(data, report):
+    analysis, issues = validate_analysis(data)
+    if report is not None:
+        if analysis is None:
+            report["rejected"] += 1
+        elif issues:
+            report["repaired"] += 1
+    return analysis
+
+
+def _message_content(response_json):
+    """The assistant's answer text and whether the token limit cut it off; raises ValueError on refusals"""
+    choice = response_json["choices"][0]
+    message = choice["message"]
+    if message.get("refusal"):
+        raise ValueError(f"Refused: {message['refusal']}")
+    return message["content"], choice.get("finish_reason") == "length"
+
+
+def parse_ai_response(response_json, report=None):
+    """Extract and validate the ai_analysis object of a chat-completions response.
+
+    Output cut off by the token limit is a failure. ``report`` (a Counter)
+    counts analyses that were ``repaired``, ``rejected`` or ``truncated``.
+    """
+    try:
+        content, truncated = _message_content(response_json)
+    except ValueError as e:
+        return error_analysis(str(e))
+    except (KeyError, IndexError, TypeError):
+        return error_analysis()
+    if truncated:
+        if report is not None:
+            report["truncated"] += 1
+        return error_analysis("Response truncated")
+    ai_analysis = _validated(decode_model_json(content), report)
+    return ai_analysis if ai_analysis is not None else error_analysis()
+
+
+def _complete_item(item):
+    """True when a batch entry has every field and passes validation without repairs.
+
+    A cut through an insight leaves that insight without text, which shows
+    up as an issue, so such an entry does not count as complete.
+    """
+    if not isinstance(item, dict) or not all(field in item for field in ("sentiment", "archetype", "insights")):
+        return False
+    analysis, issues = validate_analysis(item)
+    return analysis is not None and not issues
+
+
+def parse_batch_response(response_json, count, report=None):
+    """Split a batched response into per-article ai_analysis objects.
+
+    Returns a list of length ``count``; entries the model skipped, mangled
+    or lost to truncation are None so the caller can retry those articles
+    on their own. After a truncation, the last entry is kept only if it
+    is complete and valid. Each entry is validated like
+    ``parse_ai_response``.
+    """
+    try:
+        content, truncated = _message_content(response_json)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return [None] * count
+    payload = decode_model_json(content, truncated=truncated)
+    if truncated and report is not None:
+        report["truncated"] += 1
+
+    items = payload.get("results") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return [None] * count
+    if truncated and items and not _complete_item(items[-1]):
+        # The cut went through the last entry; retry it on its own
+        items = items[:-1]
+
+    analyses = [None] * count
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        idx = item.get("id")
+        # Fall back to position when the model omits or garbles the id
+        slot = idx - 1 if isinstance(idx, int) and 1 <= idx <= count else position
+        if slot < count and analyses[slot] is None:
+            analyses[slot] = _validated(item, report)
+    return analyses
+
+
+def build_record(article, ai_analysis, tier=LLM_TIER):
+    """Shape an analyzed article the way the dashboard expects it"""
+    return {
+        "title": article.get("title", ""),
+        "link": article.get("url", ""),
+        "source": article.get("source", ""),
+        "published_at": article.get("published_at", ""),
+        "summary": article.get("summary", ""),
+        "ai_analysis": ai_analysis,
+        "tier": tier,
+    }
@@ -0,0 +1,155 @@
+"""Persistent, content-addressed cache of ai_analysis objects."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from prismly.analysis import MODEL, PROMPT_VERSION
+from prismly.paths import data_path
+
+DEFAULT_TTL = 30 * 24 * 3600  # 30 days
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def analysis_key(article, model=MODEL, prompt_version=PROMPT_VERSION):
+    """Hash everything that influences an analysis: article content, prompt version and model"""
+    parts = [
+        article.get("url", ""),
+        article.get("title", ""),
+        article.get("summary", ""),
+        prompt_version,
+        model,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """SQLite-backed cache with TTL and least-recently-used size eviction.
+
+    Safe to share between the engine's worker threads. ``hits`` and
+    ``misses`` count lookups made through this instance. Lookups only note
+    the access time in memory; ``maintain()`` writes those times and runs
+    the TTL purge and size eviction, once per job rather than per call.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or data_path("analysis_cache.sqlite")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._accessed = {}  # key -> last access time not yet written
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " key TEXT PRIMARY KEY,"
+            " analysis TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached analysis for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis, created_at FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, analysis):
+        """Store an analysis; size eviction waits for ``maintain()``"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, analysis, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(analysis), now, now),
+            )
+            self._accessed.pop(key, None)
+            self._conn.commit()
+
+    def _flush_accessed(self):
+        # Caller holds the lock
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE analyses SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def flush(self):
+        """Write the access times noted by get() in one transaction"""
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+
+    def purge_expired(self):
+        """Delete entries older than the TTL and return how many were removed"""
+        if not self.ttl:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM analyses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def evict(self):
+        """Delete the least recently used entries over max_entries and return how many were removed"""
+        if not self.max_entries:
+            return 0
+        with self._lock:
+            self._flush_accessed()
+            cursor = self._conn.execute(
+                "DELETE FROM analyses WHERE key IN ("
+                " SELECT key FROM analyses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def maintain(self):
+        """Write pending access times, purge expired entries and evict over max_entries.
+
+        Returns (expired, evicted) counts. Run once per job.
+        """
+        self.flush()
+        return self.purge_expired(), self.evict()
+
+    def clear(self):
+        """Remove every cached analysis"""
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def stats(self):
+        """Lookup counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        """Write pending access times and close the connection"""
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,257 @@
+"""Local TF-IDF pre-classifier for sentiment and archetype.
+
+A CPU-only model trained on analyses the LLM produced earlier (read from the
+Parquet result history). Articles it scores confidently are answered locally
+in milliseconds; the rest are escalated to OpenAI. Features are TF-IDF
+weighted word unigrams and bigrams, kept as a sparse row matrix; each label
+has a softmax-regression head. Everything is plain NumPy.
+"""
+
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from prismly.analysis import ARCHETYPES, LLM_TIER, LOCAL_TIER, SENTIMENTS
+from prismly.paths import data_path
+
+MODEL_FILE = "classifier.npz"
+
+MAX_FEATURES = 5000
+MIN_DF = 2  # ignore terms seen in fewer training articles
+MIN_TRAINING_EXAMPLES = 200
+MAX_TRAINING_EXAMPLES = 20000  # newest analyses kept; bounds training time
+HOLDOUT_SHARE = 0.2
+DEFAULT_THRESHOLD = 0.8  # both heads must be at least this confident
+
+EPOCHS = 300
+LEARNING_RATE = 4.0
+L2_PENALTY = 1e-4
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercased word unigrams and bigrams"""
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def article_text(article):
+    """The text the classifier sees: title plus summary"""
+    return f"{article.get('title', '')} {article.get('summary', '')}"
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+class SparseRows:
+    """Compressed sparse row (CSR) matrix with the two products training needs"""
+
+    def __init__(self, indptr, indices, data, columns):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = (len(indptr) - 1, columns)
+        self.rows = np.repeat(np.arange(self.shape[0]), np.diff(indptr))
+        self._by_column = None
+
+    @staticmethod
+    def _sum_segments(products, starts, count):
+        # Segment sums of consecutive runs; empty segments stay zero
+        counts = np.diff(np.append(starts, len(products)))
+        result = np.zeros((count, products.shape[1]), dtype=np.float32)
+        filled = counts > 0
+        if filled.any():
+            result[filled] = np.add.reduceat(products, starts[filled], axis=0)
+        return result
+
+    def dot(self, dense):
+        """self @ dense"""
+        products = self.data[:, None] * dense[self.indices]
+        return self._sum_segments(products, self.indptr[:-1], self.shape[0])
+
+    def transpose_dot(self, dense):
+        """self.T @ dense, via a column-sorted copy built on first use"""
+        if self._by_column is None:
+            order = np.argsort(self.indices, kind="stable")
+            starts = np.searchsorted(self.indices[order], np.arange(self.shape[1]))
+            self._by_column = (self.rows[order], self.data[order], starts)
+        rows, data, starts = self._by_column
+        return self._sum_segments(data[:, None] * dense[rows], starts, self.shape[1])
+
+
+def _fit_head(X, labels, epochs=EPOCHS, learning_rate=LEARNING_RATE, l2=L2_PENALTY):
+    """Full-batch gradient descent on a multinomial logistic regression"""
+    classes = np.array(sorted(set(labels)))
+    y = np.searchsorted(classes, labels)
+    targets = np.zeros((len(y), len(classes)), dtype=np.float32)
+    targets[np.arange(len(y)), y] = 1
+    weights = np.zeros((X.shape[1], len(classes)), dtype=np.float32)
+    bias = np.zeros(len(classes), dtype=np.float32)
+    for _ in range(epochs):
+        gradient = (_softmax(X.dot(weights) + bias) - targets) / len(y)
+        weights -= learning_rate * (X.transpose_dot(gradient) + l2 * weights)
+        bias -= learning_rate * gradient.sum(axis=0)
+    return classes, weights, bias
+
+
+class LocalClassifier:
+    """TF-IDF features with softmax heads for sentiment and archetype"""
+
+    def __init__(self, vocabulary, idf, heads, metrics=None):
+        self.vocabulary = {term: idx for idx, term in enumerate(vocabulary)}
+        self.idf = idf
+        self.heads = heads  # name -> (classes, weights, bias)
+        self.metrics = metrics or {}
+
+    def transform(self, texts):
+        """Row-normalized sparse TF-IDF matrix of shape (len(texts), features)"""
+        indptr, columns, counts = [0], [], []
+        for text in texts:
+            terms = Counter(self.vocabulary.get(token) for token in tokenize(text))
+            terms.pop(None, None)
+            columns.extend(terms)
+            counts.extend(terms.values())
+            indptr.append(len(columns))
+        columns = np.array(columns, dtype=np.int64)
+        # Sublinear term frequency
+        data = (np.log1p(np.array(counts, dtype=np.float32)) * self.idf[columns]).astype(np.float32)
+        indptr = np.array(indptr, dtype=np.int64)
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(texts)))
+        data = (data / np.where(norms == 0, 1, norms)[rows]).astype(np.float32)
+        return SparseRows(indptr, columns, data, len(self.idf))
+
+    def predict_proba(self, texts):
+        """Per head: (labels, probabilities) with one entry per text"""
+        X = self.transform(texts)
+        predictions = {}
+        for name, (classes, weights, bias) in self.heads.items():
+            probabilities = _softmax(X.dot(weights) + bias)
+            best = probabilities.argmax(axis=1)
+            predictions[name] = (classes[best], probabilities[np.arange(len(texts)), best])
+        return predictions
+
+    def classify(self, articles, threshold=DEFAULT_THRESHOLD):
+        """Score articles in one batch.
+
+        Returns one ai_analysis per article, or None where either head is
+        below ``threshold`` and the article should go to the LLM.
+        """
+        if not articles:
+            return []
+        predictions = self.predict_proba([article_text(article) for article in articles])
+        sentiments, sentiment_scores = predictions["sentiment"]
+        archetypes, archetype_scores = predictions["archetype"]
+        analyses = []
+        for sentiment, sentiment_score, archetype, archetype_score in zip(
+                sentiments, sentiment_scores, archetypes, archetype_scores):
+            if min(sentiment_score, archetype_score) < threshold:
+                analyses.append(None)
+                continue
+            analyses.append({
+                "sentiment": {
+                    "classification": str(sentiment),
+                    "confidence": round(float(sentiment_score), 2),
+                    "reasoning": f"Local classifier ({LOCAL_TIER} tier), {sentiment_score:.0%} probability.",
+                },
+                "archetype": {
+                    "primary": str(archetype),
+                    "reasoning": f"Local classifier ({LOCAL_TIER} tier), {archetype_score:.0%} probability.",
+                },
+                "insights": [],
+            })
+        return analyses
+
+    @classmethod
+    def train(cls, texts, sentiments, archetypes, max_features=MAX_FEATURES, min_df=MIN_DF,
+              holdout_share=HOLDOUT_SHARE, threshold=DEFAULT_THRESHOLD, seed=0):
+        """Fit vocabulary, IDF and both heads; hold-out scores end up in ``metrics``"""
+        order = np.random.default_rng(seed).permutation(len(texts))
+        holdout = order[:int(len(texts) * holdout_share)]
+        training = order[len(holdout):]
+
+        document_frequency = Counter(term for i in training for term in set(tokenize(texts[i])))
+        vocabulary = [term for term, count in document_frequency.most_common(max_features) if count >= min_df]
+        counts = np.array([document_frequency[term] for term in vocabulary], dtype=np.float32)
+        idf = np.log((1 + len(training)) / (1 + counts)) + 1
+
+        model = cls(vocabulary, idf, {})
+        X = model.transform([texts[i] for i in training])
+        labels = {"sentiment": np.asarray(sentiments), "archetype": np.asarray(archetypes)}
+        model.heads = {name: _fit_head(X, values[training]) for name, values in labels.items()}
+        model.metrics = {"examples": len(texts), "features": len(vocabulary)}
+
+        if len(holdout):
+            predictions = model.predict_proba([texts[i] for i in holdout])
+            confident = np.ones(len(holdout), dtype=bool)
+            correct = np.ones(len(holdout), dtype=bool)
+            for name, (predicted, scores) in predictions.items():
+                hits = predicted == labels[name][holdout]
+                model.metrics[f"{name}_accuracy"] = float(hits.mean())
+                confident &= scores >= threshold
+                correct &= hits
+            model.metrics["local_share"] = float(confident.mean())
+            model.metrics["local_accuracy"] = float(correct[confident].mean()) if confident.any() else 0.0
+        return model
+
+    def save(self, path=None):
+        """Write the model to a .npz file (atomically)"""
+        path = path or data_path(MODEL_FILE)
+        arrays = {
+            "vocabulary": np.array(sorted(self.vocabulary, key=self.vocabulary.get)),
+            "idf": self.idf,
+            "metrics": np.array([f"{key}={value}" for key, value in self.metrics.items()]),
+        }
+        for name, (classes, weights, bias) in self.heads.items():
+            arrays[f"{name}_classes"] = classes
+            arrays[f"{name}_weights"] = weights
+            arrays[f"{name}_bias"] = bias
+        partial = path + ".partial.npz"
+        np.savez_compressed(partial, **arrays)
+        os.replace(partial, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        """Read a saved model, or return None if none has been trained"""
+        path = path or data_path(MODEL_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as arrays:
+            heads = {
+                name: (arrays[f"{name}_classes"], arrays[f"{name}_weights"], arrays[f"{name}_bias"])
+                for name in ("sentiment", "archetype")
+            }
+            metrics = {}
+            for entry in arrays["metrics"]:
+                key, value = str(entry).split("=", 1)
+                metrics[key] = float(value)
+            return cls(list(arrays["vocabulary"]), arrays["idf"], heads, metrics)
+
+
+def train_from_history(result_store, min_examples=MIN_TRAINING_EXAMPLES, max_examples=MAX_TRAINING_EXAMPLES):
+    """Train on the latest LLM analysis of the newest ``max_examples`` stored articles.
+
+    Rows produced by the local tier are excluded so the model never learns
+    from its own guesses, as are labels outside the taxonomy (such as the
+    "Unknown" archetype filled in for missing ones). Returns None when there
+    is too little data.
+    """
+    frame = result_store.latest_analyses(["title", "summary", "sentiment", "archetype", "tier"])
+    # Rows archived before tiers existed all came from the LLM
+    frame = frame[
+        (frame["tier"].fillna(LLM_TIER) != LOCAL_TIER)
+        & frame["sentiment"].isin(SENTIMENTS)
+        & frame["archetype"].isin(ARCHETYPES)
+    ]
+    frame = frame.sort_values("run_at").tail(max_examples)
+    if len(frame) < min_examples or frame["sentiment"].nunique() < 2 or frame["archetype"].nunique() < 2:
+        return None
+    texts = (frame["title"].fillna("") + " " + frame["summary"].fillna("")).tolist()
+    return LocalClassifier.train(texts, frame["sentiment"].tolist(), frame["archetype"].tolist())
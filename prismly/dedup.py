@@ -0,0 +1,248 @@
+"""Near-duplicate detection for syndicated and cross-posted articles.
+
+Articles are matched on a canonical URL first, then on the estimated
+Jaccard similarity of their title and summary word shingles (MinHash, with
+LSH banding so lookups only compare likely matches). Signatures live in a
+persistent SQLite index, so a cross-post seen in an earlier run still joins
+its cluster. The index only remembers which analysis cache entry holds a
+cluster's analysis; the analysis itself stays in the cache.
+"""
+
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from prismly.analysis import MODEL, PROMPT_VERSION
+from prismly.paths import data_path
+
+DEFAULT_TTL = 90 * 24 * 3600  # 90 days
+
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 5  # too little text for a trustworthy signature below this
+SIMILARITY_THRESHOLD = 0.7  # estimated Jaccard similarity of shingle sets
+
+NUM_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs at 0.7 similarity share a band ~99% of the time
+LSH_BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_seed = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_seed.randrange(1, _MERSENNE_PRIME), _seed.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ocid", "cmp", "ref", "source"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def canonical_url(url):
+    """Normalize a link so trivially different URLs of one article compare equal.
+
+    Lowercases the host, drops ``www.``, default ports, fragments, tracking
+    parameters and trailing slashes, sorts the query and treats http as https.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Word n-grams of lowercased alphanumeric tokens"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(features):
+    """MinHash signature of a set of features under NUM_PERMUTATIONS hash permutations"""
+    hashes = [_hash64(feature) for feature in set(features)]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the feature sets behind two signatures"""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERMUTATIONS
+
+
+def article_signature(article):
+    """MinHash of an article's title and summary, or None if the text is too short"""
+    features = shingles(f"{article.get('title', '')} {article.get('summary', '')}")
+    if len(set(features)) < MIN_SHINGLES:
+        return None
+    return minhash(features)
+
+
+def _band_buckets(signature):
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        # SQLite integers are signed 64-bit
+        buckets.append(_hash64(",".join(map(str, rows))) - (1 << 63))
+    return buckets
+
+
+class DedupIndex:
+    """Persistent SQLite index mapping articles to near-duplicate clusters.
+
+    Safe to share between threads. Each cluster can point at the
+    analysis cache entry of its analyzed member, for cross-posts in later
+    runs to reuse as long as model and prompt version match.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, threshold=SIMILARITY_THRESHOLD):
+        self.path = path or data_path("dedup.sqlite")
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " canonical_url TEXT PRIMARY KEY,"
+            " cluster_id TEXT NOT NULL,"
+            " signature BLOB,"
+            " title TEXT,"
+            " link TEXT,"
+            " source TEXT,"
+            " seen_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS lsh_buckets ("
+            " band INTEGER NOT NULL,"
+            " bucket INTEGER NOT NULL,"
+            " canonical_url TEXT NOT NULL,"
+            " PRIMARY KEY (band, bucket, canonical_url)) WITHOUT ROWID;"
+            # Earlier versions kept analyses here, outside the cache's lifetime and toggle
+            "DROP TABLE IF EXISTS clusters;"
+            "CREATE TABLE IF NOT EXISTS cluster_members ("
+            " cluster_id TEXT PRIMARY KEY,"
+            " cache_key TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " updated_at REAL NOT NULL);"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def _nearest_cluster(self, signature, buckets):
+        where = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in buckets)
+        rows = self._conn.execute(
+            "SELECT DISTINCT f.cluster_id, f.signature FROM lsh_buckets b"
+            " JOIN fingerprints f ON f.canonical_url = b.canonical_url"
+            f" WHERE {where}",
+            [value for band, bucket in enumerate(buckets) for value in (band, bucket)],
+        ).fetchall()
+        best = None
+        for cluster_id, blob in rows:
+            score = similarity(signature, array("Q", blob))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (cluster_id, score)
+        return best[0] if best else None
+
+    def assign(self, article):
+        """Return the cluster ID of an article, recording it in the index.
+
+        An article joins the cluster of a stored article with the same
+        canonical URL, else of the most similar stored article at or above
+        ``threshold``, else starts a new cluster.
+        """
+        url = canonical_url(article.get("url", "")) or f"guid:{article.get('guid', '')}"
+        signature = article_signature(article)
+        buckets = _band_buckets(signature) if signature is not None else []
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cluster_id FROM fingerprints WHERE canonical_url = ?", (url,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE fingerprints SET seen_at = ? WHERE canonical_url = ?", (now, url))
+                self._conn.commit()
+                return row[0]
+
+            cluster_id = self._nearest_cluster(signature, buckets) if buckets else None
+            cluster_id = cluster_id or uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    cluster_id,
+                    array("Q", signature).tobytes() if signature is not None else None,
+                    article.get("title", ""),
+                    article.get("url", ""),
+                    article.get("source", ""),
+                    now,
+                ),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets VALUES (?, ?, ?)",
+                [(band, bucket, url) for band, bucket in enumerate(buckets)],
+            )
+            self._conn.commit()
+        return cluster_id
+
+    def analyzed_member(self, cluster_id, model=MODEL, prompt_version=PROMPT_VERSION):
+        """(cache key, source) of a cluster's analyzed member, or None if missing or from another model/prompt"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cache_key, source FROM cluster_members WHERE cluster_id = ? AND version = ?",
+                (cluster_id, f"{model}/{prompt_version}"),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def record_member(self, cluster_id, cache_key, source, model=MODEL, prompt_version=PROMPT_VERSION):
+        """Remember the cache entry holding the analysis later members of a cluster may reuse"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cluster_members (cluster_id, cache_key, source, version, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (cluster_id, cache_key, source, f"{model}/{prompt_version}", time.time()),
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        """Forget articles not seen within the TTL, and clusters left empty; returns articles removed"""
+        if not self.ttl:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM fingerprints WHERE seen_at < ?", (time.time() - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM lsh_buckets WHERE canonical_url NOT IN (SELECT canonical_url FROM fingerprints)"
+            )
+            self._conn.execute(
+                "DELETE FROM cluster_members WHERE cluster_id NOT IN (SELECT cluster_id FROM fingerprints)"
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,585 @@
+"""In-process analysis pipeline: concurrent feed fetching plus bounded-concurrency LLM calls."""
+
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from prismly.analysis import (
+    LOCAL_TIER,
+    MODEL,
+    article_tokens,
+    build_batch_request_body,
+    build_record,
+    build_request_body,
+    error_analysis,
+    is_error_analysis,
+    pack_batches,
+    parse_ai_response,
+    parse_batch_response,
+    post_chat_completion,
+    prompt_version,
+    request_tokens,
+)
+from prismly.cache import analysis_key
+from prismly.classifier import DEFAULT_THRESHOLD
+from prismly.feeds import fetch_feed_conditional, parse_feed
+from prismly.ratelimit import RetryScheduler
+from prismly.telemetry import (
+    DEDUP,
+    FEED_FETCH,
+    FEED_PARSE,
+    LLM_CALL,
+    LOCAL_CLASSIFY,
+    PROMPT_BUILD,
+    RESPONSE_PARSE,
+    Telemetry,
+)
+
+DEFAULT_CONCURRENCY = 8
+MAX_FEED_WORKERS = 16
+DEFAULT_BATCH_TOKEN_BUDGET = 6000
+DEFAULT_MAX_BATCH_SIZE = 10
+
+
+class AnalysisEngine:
+    """Fetch RSS feeds concurrently and analyze their articles with OpenAI.
+
+    Feeds are downloaded in parallel and each parsed article is handed to a
+    worker pool capped at ``concurrency`` simultaneous chat completions.
+    Records have the same shape as the n8n workflow output. When an
+    ``AnalysisCache`` is given, articles whose content, prompt version and
+    model are unchanged reuse the stored analysis instead of calling OpenAI.
+    When a ``FeedStateStore`` is given, feeds are fetched conditionally and
+    only entries newer than the last seen GUID are analyzed. A feed's new
+    state is saved only once all of its articles have been handed to the
+    caller; articles that failed are fetched and retried on the next run.
+
+    With ``batch_token_budget`` set, a feed's uncached articles are packed
+    into multi-article requests of at most that many prompt tokens (and
+    ``max_batch_size`` articles); articles a batch response fails to cover
+    are retried with single-article calls.
+
+    OpenAI calls go through a ``RetryScheduler`` that paces requests to the
+    key's rate limits and retries 429/5xx responses. Articles that still
+    fail are reported in ``failed_articles`` rather than yielded as
+    placeholder results.
+
+    When a ``DedupIndex`` is given, each parsed article is assigned to a
+    near-duplicate cluster before analysis. Only the first member of a
+    cluster in a run is analyzed and yielded; later members are held and
+    listed in ``duplicate_clusters``, and one of them is analyzed instead
+    if that first member fails; the failed member only counts in
+    ``failed_articles`` when no copy takes its place during the run. With a cache, a cross-post of an article
+    another source had analyzed in an earlier run reuses that cached
+    analysis.
+
+    When a ``LocalClassifier`` is given, articles without a cached analysis
+    are scored locally first, a feed at a time. Those where both sentiment
+    and archetype reach ``local_threshold`` are answered without OpenAI and
+    their records carry ``tier: "local"``; the rest are escalated.
+
+    Each run collects per-stage timings, bytes, token usage and cost in
+    ``telemetry`` (a fresh ``Telemetry`` per run).
+
+    With ``structured_output`` (the default) requests use the compact
+    prompt and a strict JSON schema response format. Responses are
+    validated either way; ``validation`` counts analyses that were
+    repaired or rejected, and responses cut off by the token limit
+    (``truncated``), whose articles are retried.
+    """
+
+    def __init__(self, api_key, concurrency=DEFAULT_CONCURRENCY, model=MODEL, session=None,
+                 cache=None, feed_state=None, batch_token_budget=0, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 scheduler=None, dedup=None, classifier=None, local_threshold=DEFAULT_THRESHOLD,
+                 structured_output=True):
+        self.api_key = api_key
+        self.concurrency = max(1, int(concurrency))
+        self.model = model
+        self.structured_output = structured_output
+        self.prompt_version = prompt_version(structured_output)
+        self.cache = cache
+        self.feed_state = feed_state
+        self.dedup = dedup
+        self.classifier = classifier
+        self.local_threshold = local_threshold
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.scheduler = scheduler or RetryScheduler()
+        self.batch_requests = 0
+        self.batch_fallbacks = 0
+        self.failed_articles = []
+        self._stats_lock = threading.Lock()
+        self.session = session or self._make_session()
+        self.feed_errors = {}
+        self.feed_stats = {}
+        self.expected_articles = 0
+        self.feeds_done = 0
+        self.duplicate_clusters = {}
+        self.duplicates_skipped = 0
+        self.dedup_reused = 0
+        self.local_results = 0
+        self.validation = Counter()
+        self.telemetry = Telemetry(model)
+        self._run_clusters = {}
+        self._primaries = {}
+        self._standby = {}
+        self._resolved_clusters = set()
+        self._unrecovered = {}  # cluster ID -> failed record of a cluster no copy has taken over yet
+        self._feed_updates = {}
+        self._open_feeds = {}
+
+    def _make_session(self):
+        pool_size = max(self.concurrency, MAX_FEED_WORKERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def fetch_articles(self, feed_url, max_articles):
+        """Download and parse one feed, recording failures instead of raising"""
+        try:
+            state = self.feed_state.get(feed_url) if self.feed_state is not None else {}
+            started = time.perf_counter()
+            try:
+                response = fetch_feed_conditional(
+                    self.session, feed_url,
+                    etag=state.get("etag"),
+                    last_modified=state.get("last_modified"),
+                    stream=True,
+                )
+            finally:
+                # Time to response headers; the body streams into the parser below
+                self.telemetry.record(FEED_FETCH, time.perf_counter() - started, feed=feed_url)
+            if response.not_modified:
+                self.feed_stats[feed_url] = {"not_modified": True, "bytes": 0, "articles": 0}
+                self.feed_state.update(feed_url, etag=response.etag, last_modified=response.last_modified)
+                return []
+
+            body = response.content
+            started = time.perf_counter()
+            try:
+                articles = parse_feed(body, feed_url, max_articles, since_guid=state.get("newest_guid"))
+            finally:
+                # Parsing stops after max_articles entries, so this is all that was downloaded
+                body.close()
+                self.telemetry.record(FEED_PARSE, time.perf_counter() - started, feed=feed_url, size=body.bytes_read)
+            self.telemetry.count_articles(feed_url, len(articles))
+            self.feed_stats[feed_url] = {
+                "not_modified": False,
+                "bytes": body.bytes_read,
+                "articles": len(articles),
+            }
+            if self.feed_state is not None:
+                # Saved by _commit_feed once the articles are analyzed and handed over
+                self._feed_updates[feed_url] = {
+                    "etag": response.etag,
+                    "last_modified": response.last_modified,
+                    "previous": state,
+                    "guids": [article["guid"] for article in articles],
+                }
+            return articles
+        except Exception as e:
+            self.feed_errors[feed_url] = str(e)
+            return []
+
+    def _track_feed(self, feed_idx, feed_url, article_idxs):
+        """Start waiting for a parsed feed's articles before saving its state"""
+        if feed_url not in self._feed_updates:
+            return
+        self._open_feeds[feed_idx] = {"url": feed_url, "remaining": set(article_idxs), "failed": set()}
+        if not article_idxs:
+            self._commit_feed(feed_idx)
+
+    def _settle(self, key, failed=False):
+        """Mark one article as handed to the caller (or failed); saves the feed's state after its last"""
+        feed = self._open_feeds.get(key[0])
+        if feed is None:
+            return
+        feed["remaining"].discard(key[1])
+        if failed:
+            feed["failed"].add(key[1])
+        if not feed["remaining"]:
+            self._commit_feed(key[0])
+
+    def _commit_feed(self, feed_idx):
+        """Advance a feed's stored state past the articles this run handled.
+
+        After failures the newest GUID only moves to the entry below the
+        oldest failed article and the previous validators are kept, so the
+        next run downloads the feed again and retries them.
+        """
+        feed = self._open_feeds.pop(feed_idx)
+        update = self._feed_updates.pop(feed["url"])
+        guids = update["guids"]
+        if not feed["failed"]:
+            self.feed_state.update(
+                feed["url"],
+                etag=update["etag"],
+                last_modified=update["last_modified"],
+                newest_guid=guids[0] if guids else None,
+            )
+            return
+        below_failed = max(feed["failed"]) + 1
+        self.feed_state.update(
+            feed["url"],
+            etag=update["previous"].get("etag"),
+            last_modified=update["previous"].get("last_modified"),
+            newest_guid=guids[below_failed] if below_failed < len(guids) else None,
+        )
+
+    def _lookup(self, article):
+        """Return (cache key, cached analysis); both None when caching is off"""
+        if self.cache is None:
+            return None, None
+        key = analysis_key(article, model=self.model, prompt_version=self.prompt_version)
+        return key, self.cache.get(key)
+
+    def _store(self, key, ai_analysis):
+        # Never cache failures so the next run asks again
+        if key is not None and not is_error_analysis(ai_analysis):
+            self.cache.put(key, ai_analysis)
+
+    def _call_openai(self, body, articles):
+        """Send a chat completion for ``articles`` through the rate limiter and retry scheduler"""
+        with self.telemetry.stage(LLM_CALL):
+            response = self.scheduler.call(
+                lambda: post_chat_completion(self.session, self.api_key, body),
+                tokens=request_tokens(body),
+            )
+            response_json = response.json()
+        self.telemetry.record_usage(
+            response_json.get("usage"), feed=articles[0].get("feed_source"), articles=len(articles)
+        )
+        return response_json
+
+    def _request_analysis(self, article):
+        """Single-article OpenAI call returning an ai_analysis object"""
+        with self.telemetry.stage(PROMPT_BUILD):
+            body = build_request_body(article, model=self.model, structured=self.structured_output)
+        retried = False
+        while True:
+            try:
+                response_json = self._call_openai(body, [article])
+            except requests.exceptions.RequestException as e:
+                return error_analysis(f"Request error: {e}")
+            report = Counter()
+            with self.telemetry.stage(RESPONSE_PARSE):
+                ai_analysis = parse_ai_response(response_json, report)
+            with self._stats_lock:
+                self.validation.update(report)
+            if not report["truncated"] or retried:
+                return ai_analysis
+            # Cut off at max_tokens: ask once more with room for twice the output
+            body = dict(body, max_tokens=body["max_tokens"] * 2)
+            retried = True
+
+    def _analyze_misses(self, articles, keys):
+        """Analyze uncached articles (batched when more than one) and cache the results"""
+        if len(articles) == 1:
+            analyses = [self._request_analysis(articles[0])]
+        else:
+            with self.telemetry.stage(PROMPT_BUILD):
+                body = build_batch_request_body(articles, model=self.model, structured=self.structured_output)
+            report = Counter()
+            try:
+                response_json = self._call_openai(body, articles)
+                with self.telemetry.stage(RESPONSE_PARSE):
+                    analyses = parse_batch_response(response_json, len(articles), report)
+            except requests.exceptions.RequestException:
+                analyses = [None] * len(articles)
+            with self._stats_lock:
+                self.validation.update(report)
+                self.batch_requests += 1
+                self.batch_fallbacks += analyses.count(None)
+            analyses = [
+                ai_analysis if ai_analysis is not None else self._request_analysis(article)
+                for article, ai_analysis in zip(articles, analyses)
+            ]
+
+        for key, ai_analysis in zip(keys, analyses):
+            self._store(key, ai_analysis)
+        return [build_record(article, ai_analysis) for article, ai_analysis in zip(articles, analyses)]
+
+    def analyze_batch(self, articles):
+        """Analyze several articles in one request and return records in input order"""
+        records = [None] * len(articles)
+        misses = []
+        for idx, article in enumerate(articles):
+            key, cached = self._lookup(article)
+            if cached is not None:
+                records[idx] = build_record(article, cached)
+            else:
+                misses.append((idx, article, key))
+
+        if misses:
+            fresh = self._analyze_misses([m[1] for m in misses], [m[2] for m in misses])
+            for (idx, _, _), record in zip(misses, fresh):
+                records[idx] = record
+        return records
+
+    def analyze_article(self, article):
+        """Run one article through OpenAI (or the cache) and return its result record"""
+        return self.analyze_batch([article])[0]
+
+    def _dedup_feed(self, feed_idx, articles):
+        """Split a parsed feed into articles to analyze, ready records and held duplicates.
+
+        Returns (entries, ready, held): (article_idx, article) pairs still
+        needing analysis, records answered by the cached analysis of a
+        cross-post, and the article_idx of later members of clusters
+        already in this run, held in case the analyzed member fails.
+        """
+        entries = []
+        ready = []
+        held = []
+        for article_idx, article in enumerate(articles):
+            if self.dedup is None:
+                entries.append((article_idx, article))
+                continue
+            key = (feed_idx, article_idx)
+            with self.telemetry.stage(DEDUP):
+                cluster_id = self.dedup.assign(article)
+            member = {"title": article.get("title", ""), "link": article.get("url", ""),
+                      "source": article.get("source", "")}
+            if cluster_id in self._run_clusters:
+                cluster = self.duplicate_clusters.setdefault(
+                    cluster_id, {"primary": self._run_clusters[cluster_id], "duplicates": []}
+                )
+                cluster["duplicates"].append(member)
+                self.duplicates_skipped += 1
+                if cluster_id not in self._resolved_clusters:
+                    self._standby.setdefault(cluster_id, []).append((key, article, member))
+                    held.append(article_idx)
+                continue
+            self._run_clusters[cluster_id] = member
+            # A later copy of a cluster whose analyzed member failed takes its place
+            self._unrecovered.pop(cluster_id, None)
+
+            stored = self._cross_post_analysis(cluster_id, article)
+            if stored is not None:
+                ready.append((key, build_record(article, stored)))
+                self._resolved_clusters.add(cluster_id)
+                self.dedup_reused += 1
+            else:
+                self._primaries[key] = (cluster_id, article)
+                entries.append((article_idx, article))
+        return entries, ready, held
+
+    def _cross_post_analysis(self, cluster_id, article):
+        """Cached analysis of a copy of ``article`` another source had analyzed in an earlier run"""
+        if self.cache is None:
+            return None
+        member = self.dedup.analyzed_member(cluster_id, model=self.model, prompt_version=self.prompt_version)
+        # The same article from its own source is looked up by its current content instead
+        if member is None or member[1] == article.get("source", ""):
+            return None
+        return self.cache.get(member[0])
+
+    def _resolve_cluster(self, key, record):
+        """A cluster's analyzed member succeeded; returns the keys of its held duplicates"""
+        cluster_id, article = self._primaries.pop(key, (None, None))
+        if cluster_id is None:
+            return []
+        self._resolved_clusters.add(cluster_id)
+        # Only cached (LLM) analyses can serve later cross-posts
+        if self.cache is not None and record["tier"] != LOCAL_TIER:
+            self.dedup.record_member(
+                cluster_id,
+                analysis_key(article, model=self.model, prompt_version=self.prompt_version),
+                article.get("source", ""),
+                model=self.model,
+                prompt_version=self.prompt_version,
+            )
+        return [held_key for held_key, _, _ in self._standby.pop(cluster_id, [])]
+
+    def _promote_duplicate(self, key):
+        """A cluster's analyzed member failed; returns a held (key, article) to analyze instead, or None"""
+        cluster_id, _ = self._primaries.pop(key, (None, None))
+        if cluster_id is None:
+            return None
+        standby = self._standby.get(cluster_id)
+        if not standby:
+            # The next copy this run meets becomes the cluster's analyzed member
+            del self._run_clusters[cluster_id]
+            return None
+        dup_key, article, member = standby.pop(0)
+        self._primaries[dup_key] = (cluster_id, article)
+        self._run_clusters[cluster_id] = member
+        cluster = self.duplicate_clusters[cluster_id]
+        cluster["duplicates"].remove(member)
+        if cluster["duplicates"]:
+            cluster["primary"] = member
+        else:
+            del self.duplicate_clusters[cluster_id]
+        self.duplicates_skipped -= 1
+        self.expected_articles += 1
+        return dup_key, article
+
+    def _queue(self, llm_pool, feed_idx, entries, analysis_futures, pending):
+        """Submit entries for analysis, tracking their futures; returns the records already answered"""
+        ready, futures = self._submit_feed(llm_pool, feed_idx, entries)
+        analysis_futures.update(futures)
+        pending.update(futures)
+        return ready
+
+    def _hand_over(self, records):
+        """Yield (key, record) pairs, settling each (and its held duplicates) once the caller resumes"""
+        for key, record in records:
+            held = self._resolve_cluster(key, record)
+            yield key, record
+            # Resumed, so the caller has stored the record
+            self._settle(key)
+            for held_key in held:
+                self._settle(held_key)
+
+    def _classify_locally(self, feed_idx, misses):
+        """Answer confident (article_idx, article, key) misses with the local classifier.
+
+        Returns (escalated misses, ready records).
+        """
+        with self.telemetry.stage(LOCAL_CLASSIFY):
+            analyses = self.classifier.classify([m[1] for m in misses], threshold=self.local_threshold)
+        escalated = []
+        ready = []
+        for miss, ai_analysis in zip(misses, analyses):
+            if ai_analysis is None:
+                escalated.append(miss)
+            else:
+                ready.append(((feed_idx, miss[0]), build_record(miss[1], ai_analysis, tier=LOCAL_TIER)))
+        self.local_results += len(ready)
+        return escalated, ready
+
+    def _submit_feed(self, llm_pool, feed_idx, entries):
+        """Queue a parsed feed's (article_idx, article) entries for analysis.
+
+        Returns (ready, futures): records already answered by the cache or
+        the local classifier, and a mapping of each future to the
+        (feed_idx, article_idx) keys it covers.
+        """
+        ready = []
+        misses = []
+        for article_idx, article in entries:
+            key, cached = self._lookup(article)
+            if cached is not None:
+                ready.append(((feed_idx, article_idx), build_record(article, cached)))
+            else:
+                misses.append((article_idx, article, key))
+
+        if self.classifier is not None and misses:
+            misses, local = self._classify_locally(feed_idx, misses)
+            ready.extend(local)
+
+        if not self.batch_token_budget:
+            futures = {
+                llm_pool.submit(self._analyze_misses, [article], [key]): [(feed_idx, article_idx)]
+                for article_idx, article, key in misses
+            }
+            return ready, futures
+
+        futures = {}
+        batches = pack_batches(
+            misses, self.batch_token_budget, self.max_batch_size,
+            tokens=lambda miss: article_tokens(miss[1]),
+        )
+        for batch in batches:
+            future = llm_pool.submit(self._analyze_misses, [m[1] for m in batch], [m[2] for m in batch])
+            futures[future] = [(feed_idx, m[0]) for m in batch]
+        return ready, futures
+
+    def _iter_indexed(self, feed_urls, max_articles):
+        """Yield ((feed_idx, article_idx), record) pairs as analyses complete"""
+        self.feed_errors = {}
+        self.feed_stats = {}
+        self.expected_articles = 0
+        self.feeds_done = 0
+        self.batch_requests = 0
+        self.batch_fallbacks = 0
+        self.failed_articles = []
+        self.duplicate_clusters = {}
+        self.duplicates_skipped = 0
+        self.dedup_reused = 0
+        self.local_results = 0
+        self.telemetry = Telemetry(self.model)
+        self._run_clusters = {}
+        self._primaries = {}
+        self._standby = {}
+        self._resolved_clusters = set()
+        self._unrecovered = {}  # cluster ID -> failed record of a cluster no copy has taken over yet
+        self._feed_updates = {}
+        self._open_feeds = {}
+        feed_workers = min(MAX_FEED_WORKERS, max(1, len(feed_urls)))
+
+        with ThreadPoolExecutor(max_workers=feed_workers) as feed_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as llm_pool:
+            feed_futures = {
+                feed_pool.submit(self.fetch_articles, url, max_articles): feed_idx
+                for feed_idx, url in enumerate(feed_urls)
+            }
+            analysis_futures = {}
+            pending = set(feed_futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in feed_futures:
+                            # Start analyzing a feed's articles as soon as it is parsed
+                            feed_idx = feed_futures[future]
+                            entries, reused, held = self._dedup_feed(feed_idx, future.result())
+                            self.feeds_done += 1
+                            self.expected_articles += len(entries) + len(reused)
+                            self._track_feed(
+                                feed_idx, feed_urls[feed_idx],
+                                [idx for idx, _ in entries] + [key[1] for key, _ in reused] + held,
+                            )
+                            ready = self._queue(llm_pool, feed_idx, entries, analysis_futures, pending)
+                            yield from self._hand_over(reused + ready)
+                        else:
+                            for key, record in zip(analysis_futures[future], future.result()):
+                                # Keep failures out of the results so they cannot skew the metrics
+                                if not is_error_analysis(record["ai_analysis"]):
+                                    yield from self._hand_over([(key, record)])
+                                    continue
+                                self._settle(key, failed=True)
+                                cluster_id, _ = self._primaries.get(key, (None, None))
+                                promoted = self._promote_duplicate(key)
+                                # A copy analyzed in its place carries the same content; only a
+                                # cluster no copy recovers by the end of the run counts as failed
+                                if promoted is None and cluster_id is None:
+                                    self.failed_articles.append(record)
+                                elif promoted is None:
+                                    self._unrecovered[cluster_id] = record
+                                else:
+                                    dup_key, article = promoted
+                                    ready = self._queue(
+                                        llm_pool, dup_key[0], [(dup_key[1], article)], analysis_futures, pending
+                                    )
+                                    yield from self._hand_over(ready)
+            finally:
+                # Consumer stopped early: drop work that has not started yet
+                for future in pending:
+                    future.cancel()
+                self.failed_articles.extend(self._unrecovered.values())
+
+    def iter_results(self, feed_urls, max_articles):
+        """Yield result records one at a time, in completion order.
+
+        ``expected_articles`` and ``feeds_done`` are updated as feeds are
+        parsed so callers can report real progress while iterating.
+        """
+        for _, record in self._iter_indexed(feed_urls, max_articles):
+            yield record
+
+    def run(self, feed_urls, max_articles):
+        """Analyze every feed and return records in feed order, then article order"""
+        results = dict(self._iter_indexed(feed_urls, max_articles))
+        return [results[key] for key in sorted(results)]
+
+
+def run_analysis(feed_urls, max_articles, api_key, concurrency=DEFAULT_CONCURRENCY):
+    """Convenience wrapper: analyze feeds with a fresh engine"""
+    return AnalysisEngine(api_key, concurrency=concurrency).run(feed_urls, max_articles)
@@ -0,0 +1,170 @@
+"""Streaming exports of analysis results to JSON, NDJSON, gzip CSV and Parquet.
+
+Exports are written chunk by chunk to a file, so memory use stays flat no
+matter how many articles a job or the result history holds. Sources are a
+single job's records or any window of the Parquet result history.
+
+    python -m prismly.exports history parquet --days 90 trends.parquet
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from prismly.frames import CATEGORY_COLUMNS, COLUMNS, results_frame
+from prismly.history import SCHEMA
+from prismly.paths import data_path
+
+CHUNK_SIZE = 1000  # records per chunk read from a store
+EXPORT_RETENTION = 24 * 3600  # seconds before files in exports/ are deleted
+
+# Format -> (file extension, download MIME type)
+EXPORT_FORMATS = {
+    "json": (".json", "application/json"),
+    "ndjson": (".ndjson", "application/x-ndjson"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+JOB_SCHEMA = pa.schema([
+    (column, pa.float64() if column == "confidence" else pa.string()) for column in COLUMNS
+])
+
+
+def export_path(stem, fmt):
+    """Path of a new export file under the data directory's exports/ folder.
+
+    Exports older than EXPORT_RETENTION are removed on the way.
+    """
+    directory = data_path("exports")
+    os.makedirs(directory, exist_ok=True)
+    cutoff = time.time() - EXPORT_RETENTION
+    for name in os.listdir(directory):
+        old = os.path.join(directory, name)
+        if os.path.getmtime(old) < cutoff:
+            os.remove(old)
+    return os.path.join(directory, stem + EXPORT_FORMATS[fmt][0])
+
+
+def write_json(record_chunks, fileobj):
+    """Write records as one indented JSON array, a record at a time"""
+    fileobj.write("[")
+    first = True
+    for chunk in record_chunks:
+        for record in chunk:
+            fileobj.write("\n" if first else ",\n")
+            fileobj.write(json.dumps(record, indent=2))
+            first = False
+    fileobj.write("\n]\n" if not first else "]\n")
+
+
+def write_ndjson(record_chunks, fileobj):
+    """Write one JSON object per line"""
+    for chunk in record_chunks:
+        fileobj.writelines(json.dumps(record) + "\n" for record in chunk)
+
+
+def write_csv_gz(frame_chunks, path):
+    """Write frames to a gzip-compressed CSV with a single header row"""
+    with gzip.open(path, "wt", newline="") as fileobj:
+        header = True
+        for frame in frame_chunks:
+            frame.to_csv(fileobj, index=False, header=header)
+            header = False
+
+
+def write_parquet(table_chunks, path, schema):
+    """Write Arrow tables or record batches to one Parquet file, a row group per chunk"""
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in table_chunks:
+            if isinstance(chunk, pa.RecordBatch):
+                chunk = pa.Table.from_batches([chunk])
+            writer.write_table(chunk.cast(schema))
+
+
+def _plain_frame(records):
+    # Categorical columns would give every chunk its own dictionary type
+    frame = results_frame(records, preview_summary=False)
+    return frame.astype({column: str for column in CATEGORY_COLUMNS})
+
+
+def export_job(store, job_id, fmt, path, chunk_size=CHUNK_SIZE):
+    """Stream one job's results from a JobStore to ``path``; returns the path.
+
+    JSON and NDJSON keep the nested records; CSV and Parquet hold the
+    flattened dashboard columns with full summaries.
+    """
+    chunks = store.iter_results(job_id, chunk_size)
+    if fmt in ("json", "ndjson"):
+        with open(path, "w", encoding="utf-8") as fileobj:
+            (write_json if fmt == "json" else write_ndjson)(chunks, fileobj)
+    elif fmt == "csv.gz":
+        write_csv_gz((_plain_frame(chunk) for chunk in chunks), path)
+    elif fmt == "parquet":
+        write_parquet(
+            (pa.Table.from_pandas(_plain_frame(chunk), schema=JOB_SCHEMA, preserve_index=False) for chunk in chunks),
+            path,
+            JOB_SCHEMA,
+        )
+    else:
+        raise ValueError(f"fmt must be one of {tuple(EXPORT_FORMATS)}")
+    return path
+
+
+def export_history(result_store, fmt, path, start=None, end=None, sources=None):
+    """Stream stored analyses from a ResultStore to ``path``; returns the path.
+
+    Every stored row in the date window is exported, including repeated
+    analyses of an article from different runs (``run_id`` tells them apart).
+    """
+    batches = result_store.batches(SCHEMA.names, start, end, sources)
+    if fmt in ("json", "ndjson"):
+        record_chunks = (batch.to_pandas().to_dict("records") for batch in batches)
+        with open(path, "w", encoding="utf-8") as fileobj:
+            (write_json if fmt == "json" else write_ndjson)(_json_safe(record_chunks), fileobj)
+    elif fmt == "csv.gz":
+        write_csv_gz((batch.to_pandas() for batch in batches), path)
+    elif fmt == "parquet":
+        write_parquet(batches, path, SCHEMA)
+    else:
+        raise ValueError(f"fmt must be one of {tuple(EXPORT_FORMATS)}")
+    return path
+
+
+def _json_safe(record_chunks):
+    for chunk in record_chunks:
+        for record in chunk:
+            record["run_at"] = record["run_at"].isoformat()
+        yield chunk
+
+
+def main(argv=None):
+    from prismly.history import ResultStore
+    from prismly.jobs import JobStore
+
+    parser = argparse.ArgumentParser(description="Export Prismly results for BI tools")
+    parser.add_argument("source", help="'history' or a job ID")
+    parser.add_argument("format", choices=list(EXPORT_FORMATS))
+    parser.add_argument("output", nargs="?", help="output file (default: .prismly/exports/)")
+    parser.add_argument("--days", type=int, help="history only: last N days")
+    parser.add_argument("--source-name", action="append", dest="sources", help="history only: limit to a source")
+    args = parser.parse_args(argv)
+
+    stem = f"{args.source}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    path = args.output or export_path(stem, args.format)
+    if args.source == "history":
+        start = date.today() - timedelta(days=args.days) if args.days else None
+        export_history(ResultStore(), args.format, path, start=start, sources=args.sources)
+    else:
+        export_job(JobStore(), args.source, args.format, path)
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Per-feed HTTP validators and newest-seen GUID, for incremental polling."""
+
+import sqlite3
+import threading
+import time
+
+from prismly.paths import data_path
+
+
+class FeedStateStore:
+    """SQLite-backed store of ETag, Last-Modified and newest GUID per feed URL.
+
+    State is kept per ``scope`` (one consumer, such as an API key or the
+    scheduler), so one consumer's runs never hide posts from another.
+    Safe to share between the engine's feed-fetching threads.
+    """
+
+    def __init__(self, path=None, scope=""):
+        self.path = path or data_path("feed_state.sqlite")
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # The unscoped table of earlier versions was shared by every consumer
+        self._conn.execute("DROP TABLE IF EXISTS feeds")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_state ("
+            " scope TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " newest_guid TEXT,"
+            " checked_at REAL,"
+            " PRIMARY KEY (scope, url))"
+        )
+        self._conn.commit()
+
+    def get(self, feed_url):
+        """Return the stored state dict for a feed (empty values if never seen)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, newest_guid, checked_at FROM feed_state WHERE scope = ? AND url = ?",
+                (self.scope, feed_url),
+            ).fetchone()
+        if row is None:
+            return {"etag": None, "last_modified": None, "newest_guid": None, "checked_at": None}
+        return {"etag": row[0], "last_modified": row[1], "newest_guid": row[2], "checked_at": row[3]}
+
+    def update(self, feed_url, etag=None, last_modified=None, newest_guid=None):
+        """Record validators and, if given, the newest GUID seen for a feed"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO feed_state (scope, url, etag, last_modified, newest_guid, checked_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(scope, url) DO UPDATE SET"
+                " etag = excluded.etag,"
+                " last_modified = excluded.last_modified,"
+                " newest_guid = COALESCE(excluded.newest_guid, feed_state.newest_guid),"
+                " checked_at = excluded.checked_at",
+                (self.scope, feed_url, etag, last_modified, newest_guid, time.time()),
+            )
+            self._conn.commit()
+
+    def forget(self, feed_url=None):
+        """Drop this scope's state for one feed, or for every feed if no URL is given"""
+        with self._lock:
+            if feed_url is None:
+                self._conn.execute("DELETE FROM feed_state WHERE scope = ?", (self.scope,))
+            else:
+                self._conn.execute("DELETE FROM feed_state WHERE scope = ? AND url = ?", (self.scope, feed_url))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
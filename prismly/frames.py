@@ -0,0 +1,160 @@
+"""Vectorized pandas construction of the dashboard's result frames and metrics."""
+
+import numpy as np
+import pandas as pd
+
+from prismly.analysis import LLM_TIER
+
+SUMMARY_PREVIEW_CHARS = 200
+TITLE_DISPLAY_CHARS = 60
+INSIGHT_DISPLAY_CHARS = 80
+
+# Flattened column -> default for missing values
+DEFAULTS = {
+    "title": "N/A",
+    "link": "",
+    "source": "N/A",
+    "published_at": "",
+    "summary": "",
+    "sentiment": "neutral",
+    "confidence": 0.0,
+    "sentiment_reasoning": "",
+    "archetype": "Unknown",
+    "archetype_reasoning": "",
+    "insight_category": "N/A",
+    "insight": "N/A",
+    "recommendation": "N/A",
+    "tier": LLM_TIER,  # records from before the local tier, and n8n, are LLM results
+}
+COLUMNS = list(DEFAULTS)
+
+
+# Low-cardinality label columns; stored as categoricals so counts and string
+# formatting run once per distinct value rather than once per article
+CATEGORY_COLUMNS = ["source", "sentiment", "archetype", "insight_category", "tier"]
+
+
+def _column(values):
+    # Object arrays go into the frame as-is; plain lists would be type-inferred column by column
+    return np.array(values, dtype=object)
+
+
+def results_frame(records, preview_summary=True):
+    """Flatten analyzed article records into one row per article.
+
+    Each column is gathered straight from the records into an object
+    array, so no per-article row objects are built and pandas does no
+    type inference; type conversion then runs column-wise. Only the first
+    insight of each article is kept, matching the dashboard. With
+    ``preview_summary`` the summary is cut to a 200-character preview.
+    """
+    analyses = [article.get("ai_analysis") or {} for article in records]
+    sentiments = [ai_analysis.get("sentiment") or {} for ai_analysis in analyses]
+    archetypes = [ai_analysis.get("archetype") or {} for ai_analysis in analyses]
+    insights = [(ai_analysis.get("insights") or [{}])[0] for ai_analysis in analyses]
+
+    def article_field(name):
+        default = DEFAULTS[name]
+        return _column([article.get(name, default) for article in records])
+
+    def nested_field(items, key, name):
+        default = DEFAULTS[name]
+        return _column([item.get(key, default) for item in items])
+
+    summaries = [article.get("summary", DEFAULTS["summary"]) for article in records]
+    if preview_summary:
+        summaries = [(summary or "")[:SUMMARY_PREVIEW_CHARS] + "..." for summary in summaries]
+    frame = pd.DataFrame({
+        "title": article_field("title"),
+        "link": article_field("link"),
+        "source": article_field("source"),
+        "published_at": article_field("published_at"),
+        "summary": _column(summaries),
+        "sentiment": nested_field(sentiments, "classification", "sentiment"),
+        "confidence": nested_field(sentiments, "confidence", "confidence"),
+        "sentiment_reasoning": nested_field(sentiments, "reasoning", "sentiment_reasoning"),
+        "archetype": nested_field(archetypes, "primary", "archetype"),
+        "archetype_reasoning": nested_field(archetypes, "reasoning", "archetype_reasoning"),
+        "insight_category": nested_field(insights, "category", "insight_category"),
+        "insight": nested_field(insights, "insight", "insight"),
+        "recommendation": nested_field(insights, "recommendation", "recommendation"),
+        "tier": article_field("tier"),
+    }, columns=COLUMNS, copy=False)
+    frame["confidence"] = pd.to_numeric(frame["confidence"], errors="coerce").fillna(0.0).astype(float)
+    for column in CATEGORY_COLUMNS:
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+def key_metrics(frame):
+    """Total, per-sentiment counts and mean confidence for the Key Metrics boxes"""
+    sentiments = frame["sentiment"].value_counts()
+    return {
+        "total": len(frame),
+        "positive": int(sentiments.get("positive", 0)),
+        "neutral": int(sentiments.get("neutral", 0)),
+        "negative": int(sentiments.get("negative", 0)),
+        "avg_confidence": float(frame["confidence"].mean()) if len(frame) else 0.0,
+    }
+
+
+def distribution(frame, column):
+    """Value counts of ``column`` as a two-column frame, largest first"""
+    counts = frame[column].value_counts()
+    return pd.DataFrame({column.replace("_", " ").title(): counts.index, "Count": counts.to_numpy()})
+
+
+def truncate(series, limit):
+    """Cut strings longer than ``limit`` characters and mark them with '...'"""
+    long = series.str.len() > limit
+    result = series.copy()
+    result[long] = series[long].str[:limit] + "..."
+    return result
+
+
+def display_frame(frame):
+    """The Article Insights Overview table, built with column-wise string operations"""
+    return pd.DataFrame({
+        "Title": truncate(frame["title"], TITLE_DISPLAY_CHARS),
+        "Source": frame["source"].str.replace("_", " ").str.title(),
+        "Sentiment": frame["sentiment"].str.capitalize(),
+        "Confidence": (frame["confidence"] * 100).round().astype(int).astype(str) + "%",
+        "Archetype": frame["archetype"],
+        "Insight": truncate(frame["insight"], INSIGHT_DISPLAY_CHARS),
+    })
+
+
+# Deep Dive / overview sort options -> frame column
+SORT_COLUMNS = {
+    "Confidence": "confidence",
+    "Published": "published_at",
+    "Title": "title",
+    "Source": "source",
+    "Sentiment": "sentiment",
+    "Archetype": "archetype",
+}
+
+
+def filter_frame(frame, sources=None, sentiments=None, archetypes=None, min_confidence=0.0):
+    """Rows matching every given filter; empty filter lists mean 'any'"""
+    mask = frame["confidence"] >= min_confidence
+    for column, values in (("source", sources), ("sentiment", sentiments), ("archetype", archetypes)):
+        if values:
+            mask &= frame[column].isin(values)
+    return frame[mask]
+
+
+def sort_frame(frame, sort_by="Confidence", ascending=False):
+    """Frame sorted by one of SORT_COLUMNS, keeping arrival order for ties"""
+    return frame.sort_values(SORT_COLUMNS[sort_by], ascending=ascending, kind="stable")
+
+
+def page_slice(frame, page, page_size):
+    """Rows of the 1-based ``page``, clamped to the valid range.
+
+    Returns (rows, page, page_count).
+    """
+    page_count = max(1, -(-len(frame) // page_size))
+    page = min(max(int(page), 1), page_count)
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size], page, page_count
@@ -0,0 +1,175 @@
+"""Partitioned Parquet history of analyzed articles, with trend queries.
+
+Every finished run is appended to a hive-partitioned dataset
+(``date=YYYY-MM-DD/source=...``) so trend queries only read the partitions
+and columns they need instead of loading every past run.
+"""
+
+import re
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from prismly.frames import results_frame
+from prismly.paths import data_path
+
+SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("run_at", pa.timestamp("us", tz="UTC")),
+    ("date", pa.string()),
+    ("source", pa.string()),
+    ("title", pa.string()),
+    ("link", pa.string()),
+    ("published_at", pa.string()),
+    ("summary", pa.string()),
+    ("sentiment", pa.string()),
+    ("confidence", pa.float64()),
+    ("sentiment_reasoning", pa.string()),
+    ("archetype", pa.string()),
+    ("archetype_reasoning", pa.string()),
+    ("insight_category", pa.string()),
+    ("insight", pa.string()),
+    ("recommendation", pa.string()),
+    ("tier", pa.string()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("source", pa.string())]), flavor="hive"
+)
+
+TREND_FIELDS = ("sentiment", "archetype", "insight_category")
+FREQUENCIES = {"day": "D", "week": "W", "month": "M"}
+
+_PARTITION_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _to_table(records, run_id, run_at):
+    frame = results_frame(records, preview_summary=False)
+    frame["run_id"] = run_id
+    frame["run_at"] = pd.Timestamp(run_at)
+    # Partition by publication day so trends follow when things were said
+    # Missing (None) values fall back to the run date and "unknown", not a null partition
+    frame["date"] = frame["published_at"].fillna("").str[:10].replace("", run_at.date().isoformat())
+    frame["source"] = (
+        frame["source"].astype(object).fillna("").astype(str).replace({"N/A": "unknown", "": "unknown"})
+        .str.replace(_PARTITION_UNSAFE_RE, "_", regex=True)
+    )
+    return pa.Table.from_pandas(frame[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+class ResultStore:
+    """Append-only Parquet dataset of analysis results across runs"""
+
+    def __init__(self, root=None):
+        self.root = root or data_path("results")
+
+    def append_run(self, run_id, records, run_at=None):
+        """Write one run's records as new Parquet files; returns rows written"""
+        if not records:
+            return 0
+        run_at = run_at or datetime.now(timezone.utc)
+        table = _to_table(records, run_id, run_at)
+        ds.write_dataset(
+            table,
+            self.root,
+            format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"{run_id}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return table.num_rows
+
+    def dataset(self):
+        """The pyarrow Dataset over every stored run, or None when empty"""
+        try:
+            return ds.dataset(self.root, format="parquet", schema=SCHEMA, partitioning=PARTITIONING)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+    def _filter(self, start=None, end=None, sources=None):
+        expression = None
+        conditions = []
+        if start is not None:
+            conditions.append(ds.field("date") >= start.isoformat())
+        if end is not None:
+            conditions.append(ds.field("date") <= end.isoformat())
+        if sources:
+            conditions.append(ds.field("source").isin(list(sources)))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def sources(self):
+        """Sources that have at least one stored article"""
+        dataset = self.dataset()
+        if dataset is None:
+            return []
+        values = set()
+        for batch in dataset.to_batches(columns=["source"]):
+            values.update(batch.column(0).unique().to_pylist())
+        return sorted(values)
+
+    def batches(self, columns, start=None, end=None, sources=None):
+        """Yield non-empty Arrow record batches of ``columns``, pruned by date and source"""
+        dataset = self.dataset()
+        if dataset is None:
+            return
+        for batch in dataset.to_batches(columns=columns, filter=self._filter(start, end, sources)):
+            if batch.num_rows:
+                yield batch
+
+    def scan(self, columns, start=None, end=None, sources=None):
+        """Yield pandas frames of ``columns`` batch by batch, pruned by date and source"""
+        for batch in self.batches(columns, start, end, sources):
+            yield batch.to_pandas()
+
+    def latest_analyses(self, columns, start=None, end=None, sources=None):
+        """Latest stored analysis per article link, reading only the given columns"""
+        key_columns = ["link", "run_at"]
+        wanted = list(dict.fromkeys(key_columns + list(columns)))
+        deduped = None
+        for frame in self.scan(wanted, start, end, sources):
+            if deduped is not None:
+                frame = pd.concat([deduped, frame], ignore_index=True)
+            # Keep only the newest run's analysis of each article as we go
+            deduped = frame.sort_values("run_at").drop_duplicates("link", keep="last")
+        if deduped is None:
+            return pd.DataFrame(columns=wanted)
+        return deduped.reset_index(drop=True)
+
+    def distribution(self, field, days=90, freq="week", sources=None, today=None):
+        """Article counts per period, source and value of ``field`` over the last ``days`` days.
+
+        Returns a long DataFrame with columns period, source, <field>, count.
+        Re-analyses of the same article count once (latest run wins).
+        """
+        if field not in TREND_FIELDS:
+            raise ValueError(f"field must be one of {TREND_FIELDS}")
+        today = today or date.today()
+        frame = self.latest_analyses(
+            ["date", "source", field], start=today - timedelta(days=days), end=today, sources=sources
+        )
+        if frame.empty:
+            return pd.DataFrame(columns=["period", "source", field, "count"])
+        frame["period"] = pd.to_datetime(frame["date"]).dt.to_period(FREQUENCIES[freq]).dt.start_time
+        return (
+            frame.groupby(["period", "source", field]).size()
+            .rename("count").reset_index()
+            .sort_values(["period", "source", field])
+        )
+
+    def confidence_trend(self, days=90, freq="week", sources=None, today=None):
+        """Mean sentiment confidence and article count per period and source"""
+        today = today or date.today()
+        frame = self.latest_analyses(
+            ["date", "source", "confidence"], start=today - timedelta(days=days), end=today, sources=sources
+        )
+        if frame.empty:
+            return pd.DataFrame(columns=["period", "source", "avg_confidence", "articles"])
+        frame["period"] = pd.to_datetime(frame["date"]).dt.to_period(FREQUENCIES[freq]).dt.start_time
+        return (
+            frame.groupby(["period", "source"])
+            .agg(avg_confidence=("confidence", "mean"), articles=("link", "count"))
+            .reset_index()
+        )
@@ -0,0 +1,453 @@
+"""Background analysis jobs with results persisted to a local store.
+
+Jobs run on worker threads independent of the Streamlit script, so a rerun
+(or a closed tab) does not discard a paid analysis. The UI polls the store
+by job ID and renders whatever has been recorded so far.
+
+The job manager is shared by every session of the process. Identical
+submissions from different sessions join one job instead of paying for the
+same work twice, and a ledger records which API key paid for what.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from prismly.analysis import is_error_analysis
+from prismly.cache import AnalysisCache
+from prismly.classifier import DEFAULT_THRESHOLD, MIN_TRAINING_EXAMPLES, LocalClassifier, train_from_history
+from prismly.dedup import DedupIndex
+from prismly.engine import AnalysisEngine
+from prismly.feed_state import FeedStateStore
+from prismly.history import ResultStore
+from prismly.n8n import stream_n8n_webhook
+from prismly.paths import data_path
+from prismly.ratelimit import RateLimiter, RetryScheduler
+from prismly.telemetry import AGGREGATION, N8N_WEBHOOK, Telemetry
+
+MAX_CONCURRENT_JOBS = 4
+
+# Identical submissions join a job that is still running or finished this recently
+COALESCE_WINDOW = 300  # seconds
+# Params that decide what a job produces; the rest only change how it is computed
+WORK_PARAMS = (
+    "backend", "webhook_url", "feed_urls", "max_articles",
+    "only_new_posts", "dedup", "local_classifier", "local_threshold", "structured_output",
+)
+
+LOCAL_BACKEND = "local"
+N8N_BACKEND = "n8n"
+TRAINING_BACKEND = "train_classifier"
+
+
+def key_id(api_key):
+    """Stable, non-reversible identifier of an API key for usage accounting"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def work_key(params, owner=None):
+    """Hash of the params that decide a job's results; equal keys mean identical work.
+
+    Incremental runs depend on the submitting key's feed state, so they
+    only match runs of the same ``owner`` (key ID).
+    """
+    work = {name: params.get(name) for name in WORK_PARAMS}
+    work["feed_urls"] = sorted(work["feed_urls"] or [])
+    if params.get("only_new_posts"):
+        work["owner"] = owner
+    return hashlib.sha256(json.dumps(work, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """SQLite store of job status, progress, run info and result records"""
+
+    def __init__(self, path=None):
+        self.path = path or data_path("jobs.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " progress_done INTEGER NOT NULL DEFAULT 0,"
+            " progress_total INTEGER NOT NULL DEFAULT 0,"
+            " info TEXT,"
+            " error TEXT);"
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            " job_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " record TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, seq));"
+            "CREATE TABLE IF NOT EXISTS key_usage ("
+            " key_id TEXT NOT NULL,"
+            " job_id TEXT NOT NULL,"
+            " shared INTEGER NOT NULL,"
+            " requests INTEGER NOT NULL DEFAULT 0,"
+            " prompt_tokens INTEGER NOT NULL DEFAULT 0,"
+            " completion_tokens INTEGER NOT NULL DEFAULT 0,"
+            " cost_usd REAL NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (key_id, job_id));"
+        )
+        self._conn.commit()
+
+    def create(self, params):
+        """Register a queued job and return its ID"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(params), time.time()),
+            )
+            self._conn.commit()
+        return job_id
+
+    def mark_running(self, job_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def finish(self, job_id, info, error=None):
+        """Record the final status ('done' or 'failed') and run info"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, info = ?, error = ? WHERE id = ?",
+                ("failed" if error else "done", time.time(), json.dumps(info), error, job_id),
+            )
+            self._conn.commit()
+
+    def append_result(self, job_id, seq, record, expected):
+        """Persist one result record and the latest progress counters"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO job_results (job_id, seq, record) VALUES (?, ?, ?)",
+                (job_id, seq, json.dumps(record)),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ? WHERE id = ?",
+                (seq + 1, expected, job_id),
+            )
+            self._conn.commit()
+
+    def fail_interrupted(self):
+        """Mark jobs left queued or running by a previous process as failed"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Interrupted by a restart'"
+                " WHERE status IN ('queued', 'running')",
+                (time.time(),),
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, params, created_at, started_at, finished_at,"
+                " progress_done, progress_total, info, error FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return _job_from_row(row) if row else None
+
+    def results(self, job_id):
+        """All result records of a job, in the order they completed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM job_results WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_results(self, job_id, chunk_size=1000):
+        """Yield a job's result records in lists of at most ``chunk_size``, in completion order"""
+        last_seq = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, record FROM job_results WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (job_id, last_seq, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_seq = rows[-1][0]
+            yield [json.loads(row[1]) for row in rows]
+
+    def add_usage(self, key_id, job_id, shared):
+        """Record that a key started (``shared=False``) or joined a job"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO key_usage (key_id, job_id, shared, created_at) VALUES (?, ?, ?, ?)",
+                (key_id, job_id, int(shared), time.time()),
+            )
+            self._conn.commit()
+
+    def settle_usage(self, job_id, telemetry):
+        """Bill a finished job's OpenAI usage to the key that ran it"""
+        if not telemetry:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE key_usage SET requests = ?, prompt_tokens = ?, completion_tokens = ?, cost_usd = ?"
+                " WHERE job_id = ? AND shared = 0",
+                (
+                    telemetry["requests"], telemetry["prompt_tokens"],
+                    telemetry["completion_tokens"], telemetry["cost_usd"], job_id,
+                ),
+            )
+            self._conn.commit()
+
+    def usage(self, key_id, since=0.0):
+        """Totals for one key: jobs run and joined, tokens and cost paid, cost saved by joining"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(shared = 0), 0), COALESCE(SUM(shared = 1), 0),"
+                " COALESCE(SUM(requests), 0), COALESCE(SUM(prompt_tokens), 0),"
+                " COALESCE(SUM(completion_tokens), 0), COALESCE(SUM(cost_usd), 0)"
+                " FROM key_usage WHERE key_id = ? AND created_at >= ?",
+                (key_id, since),
+            ).fetchone()
+            saved = self._conn.execute(
+                "SELECT COALESCE(SUM(owner.cost_usd), 0) FROM key_usage joined"
+                " JOIN key_usage owner ON owner.job_id = joined.job_id AND owner.shared = 0"
+                " WHERE joined.key_id = ? AND joined.shared = 1 AND joined.created_at >= ?",
+                (key_id, since),
+            ).fetchone()[0]
+        return {
+            "jobs_run": row[0],
+            "jobs_joined": row[1],
+            "requests": row[2],
+            "prompt_tokens": row[3],
+            "completion_tokens": row[4],
+            "cost_usd": row[5],
+            "saved_usd": saved,
+        }
+
+
+def _job_from_row(row):
+    return {
+        "id": row[0],
+        "status": row[1],
+        "params": json.loads(row[2]),
+        "created_at": row[3],
+        "started_at": row[4],
+        "finished_at": row[5],
+        "progress_done": row[6],
+        "progress_total": row[7],
+        "info": json.loads(row[8]) if row[8] else {},
+        "error": row[9],
+    }
+
+
+def _run_local(store, job_id, api_key, params, info, limiter=None):
+    cache = AnalysisCache(ttl=params["cache_ttl"]) if params.get("use_cache") else None
+    # Every key, and the scheduler apart from the app, polls from its own position
+    scope = ("scheduler:" if params.get("scheduled") else "") + key_id(api_key)
+    feed_state = FeedStateStore(scope=scope) if params.get("only_new_posts") else None
+    dedup = DedupIndex() if params.get("dedup") else None
+    classifier = LocalClassifier.load() if params.get("local_classifier") else None
+    engine = AnalysisEngine(
+        api_key,
+        concurrency=params["concurrency"],
+        cache=cache,
+        feed_state=feed_state,
+        batch_token_budget=params.get("batch_token_budget", 0),
+        scheduler=RetryScheduler(limiter) if limiter is not None else None,
+        dedup=dedup,
+        classifier=classifier,
+        local_threshold=params.get("local_threshold", DEFAULT_THRESHOLD),
+        structured_output=params.get("structured_output", True),
+    )
+    feed_urls = params["feed_urls"]
+    max_articles = params["max_articles"]
+    try:
+        for seq, record in enumerate(engine.iter_results(feed_urls, max_articles)):
+            # Feeds still downloading count as max_articles each
+            expected = engine.expected_articles + (len(feed_urls) - engine.feeds_done) * max_articles
+            with engine.telemetry.stage(AGGREGATION):
+                store.append_result(job_id, seq, record, expected)
+    finally:
+        info["telemetry"] = engine.telemetry.snapshot()
+        info["feed_errors"] = dict(engine.feed_errors)
+        info["failed_articles"] = len(engine.failed_articles)
+        info["scheduler"] = engine.scheduler.stats()
+        if engine.validation:
+            info["validation"] = dict(engine.validation)
+        if engine.batch_requests:
+            info["batch"] = {"requests": engine.batch_requests, "fallbacks": engine.batch_fallbacks}
+        if cache is not None:
+            expired, evicted = cache.maintain()
+            info["cache"] = dict(cache.stats(), expired=expired, evicted=evicted)
+            cache.close()
+        if feed_state is not None:
+            info["feed_stats"] = dict(engine.feed_stats)
+            feed_state.close()
+        if classifier is not None:
+            info["local"] = {"answered": engine.local_results, "threshold": engine.local_threshold}
+        if dedup is not None:
+            info["dedup"] = {
+                "skipped": engine.duplicates_skipped,
+                "reused": engine.dedup_reused,
+                "clusters": list(engine.duplicate_clusters.values()),
+            }
+            dedup.close()
+
+
+def _run_n8n(store, job_id, api_key, params, info):
+    feed_urls = params["feed_urls"]
+    max_articles = params["max_articles"]
+    expected = len(feed_urls) * max_articles
+    seq = 0
+    info["skipped_placeholders"] = 0
+    telemetry = Telemetry()
+    waiting_since = time.perf_counter()
+    try:
+        for record in stream_n8n_webhook(params["webhook_url"], feed_urls, max_articles, api_key):
+            # Everything before a record arrives is time spent inside n8n
+            telemetry.record(N8N_WEBHOOK, time.perf_counter() - waiting_since)
+            # n8n emits 'Parse error' placeholders; keep them out of the metrics
+            if is_error_analysis(record.get("ai_analysis", {})):
+                info["skipped_placeholders"] += 1
+            else:
+                with telemetry.stage(AGGREGATION):
+                    store.append_result(job_id, seq, record, expected)
+                seq += 1
+            waiting_since = time.perf_counter()
+    finally:
+        info["telemetry"] = telemetry.snapshot()
+
+
+def _run_training(info):
+    model = train_from_history(ResultStore())
+    if model is None:
+        raise ValueError(
+            f"Not enough stored analyses yet (need at least {MIN_TRAINING_EXAMPLES} with varied labels)."
+        )
+    model.save()
+    info["classifier"] = model.metrics
+
+
+def run_job(store, job_id, api_key, params, limiter=None):
+    """Execute one job to completion, recording results and outcome in the store.
+
+    ``limiter`` paces OpenAI calls; pass the same one to every job using a key.
+    """
+    store.mark_running(job_id)
+    info = {}
+    try:
+        if params["backend"] == TRAINING_BACKEND:
+            _run_training(info)
+        elif params["backend"] == N8N_BACKEND:
+            _run_n8n(store, job_id, api_key, params, info)
+        else:
+            _run_local(store, job_id, api_key, params, info, limiter)
+    except requests.exceptions.Timeout:
+        error = "Request timed out. n8n workflow may be taking too long. Try reducing the number of articles."
+    except Exception as e:
+        error = str(e)
+    else:
+        error = None
+
+    # Archive whatever was analyzed, even from a run that failed part-way
+    if params["backend"] != TRAINING_BACKEND:
+        try:
+            info["archived_rows"] = ResultStore().append_run(job_id, store.results(job_id))
+        except Exception as e:
+            info["archive_error"] = str(e)
+    store.settle_usage(job_id, info.get("telemetry"))
+    store.finish(job_id, info, error=error)
+
+
+class JobManager:
+    """Process-wide queue executing jobs on a bounded pool of worker threads.
+
+    The API key is handed to the worker in memory only; it is never written
+    to the job store (usage is recorded under a hash of it). Jobs submitted
+    with the same key share one RateLimiter, so concurrent sessions on a key
+    stay within its limits together.
+    """
+
+    def __init__(self, store=None, max_workers=MAX_CONCURRENT_JOBS, coalesce_window=COALESCE_WINDOW):
+        self.store = store or JobStore()
+        self.store.fail_interrupted()
+        self.coalesce_window = coalesce_window
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prismly-job")
+        self._lock = threading.Lock()
+        self._work = {}  # work key -> ID of the latest job doing that work, while it can be joined
+        self._limiters = {}  # key ID -> RateLimiter shared by the key's jobs
+
+    def _joinable(self, job, now):
+        if job is None or job["error"]:
+            return False
+        if job["status"] in ("queued", "running"):
+            return True
+        return job["status"] == "done" and job["finished_at"] >= now - self.coalesce_window
+
+    def _forget(self, work, job_id, joinable_after=True):
+        """Drop a finished job from ``_work`` unless it may still be joined"""
+        with self._lock:
+            if self._work.get(work) != job_id:
+                return
+            if joinable_after and self._joinable(self.store.get(job_id), time.time()):
+                return
+            del self._work[work]
+
+    def _prune(self, now):
+        # Caller holds the lock; finished jobs past the coalesce window
+        for work, job_id in list(self._work.items()):
+            if not self._joinable(self.store.get(job_id), now):
+                del self._work[work]
+
+    def submit(self, api_key, params, share=True):
+        """Queue an analysis; returns (job ID, joined).
+
+        With ``share``, an identical job (same WORK_PARAMS) that is queued,
+        running or finished within ``coalesce_window`` is joined instead:
+        its ID is returned with ``joined=True`` and nothing is billed to
+        ``api_key``.
+        """
+        owner = key_id(api_key)
+        work = work_key(params, owner)
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if share and work in self._work:
+                job_id = self._work[work]
+                if self._joinable(self.store.get(job_id), now):
+                    self.store.add_usage(owner, job_id, shared=True)
+                    return job_id, True
+            job_id = self.store.create(params)
+            self._work[work] = job_id
+            limiter = self._limiters.setdefault(owner, RateLimiter())
+        self.store.add_usage(owner, job_id, shared=False)
+        future = self._pool.submit(run_job, self.store, job_id, api_key, params, limiter)
+        future.add_done_callback(lambda _: self._forget(work, job_id))
+        return job_id, False
+
+    def submit_training(self):
+        """Queue a local classifier training run; returns its job ID.
+
+        Training needs no API key. While one run is queued or running, it is
+        returned instead of starting another.
+        """
+        params = {"backend": TRAINING_BACKEND}
+        with self._lock:
+            job_id = self._work.get(TRAINING_BACKEND)
+            job = self.store.get(job_id) if job_id else None
+            if job is not None and job["status"] in ("queued", "running"):
+                return job_id
+            job_id = self.store.create(params)
+            self._work[TRAINING_BACKEND] = job_id
+        future = self._pool.submit(run_job, self.store, job_id, None, params)
+        future.add_done_callback(lambda _: self._forget(TRAINING_BACKEND, job_id, joinable_after=False))
+        return job_id
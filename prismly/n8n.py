@@ -0,0 +1,45 @@
+"""Client for the hosted n8n brand-intelligence workflow."""
+
+import json
+
+import requests
+
+# n8n Webhook URL - Production (Render Cloud)
+N8N_WEBHOOK_URL = "https://brand-intelligence-n8n.onrender.com/webhook/brand-intelligence"
+N8N_TIMEOUT = 900  # 15 minute timeout for n8n to process
+
+
+def unwrap_n8n_results(result_data):
+    """Get the article list from an n8n response - handle [{data: [...]}] structure"""
+    if isinstance(result_data, list) and len(result_data) > 0:
+        if isinstance(result_data[0], dict) and "data" in result_data[0]:
+            # n8n webhook response format: [{data: [...]}]
+            return result_data[0]["data"]
+        return result_data
+    if isinstance(result_data, dict) and "data" in result_data:
+        return result_data["data"]
+    return []
+
+
+def stream_n8n_webhook(webhook_url, feed_urls, max_articles_per_feed, api_key):
+    """Yield analyzed articles from the n8n webhook.
+
+    If the workflow responds with NDJSON (one article per line) each article is
+    yielded as soon as it arrives; otherwise the aggregated payload is unpacked.
+    """
+    payload = {
+        "feeds": feed_urls,
+        "max_articles": max_articles_per_feed,
+        "openai_api_key": api_key,
+    }
+
+    with requests.post(webhook_url, json=payload, timeout=N8N_TIMEOUT, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"n8n webhook returned error: {response.status_code} - {response.text}")
+
+        if "ndjson" in response.headers.get("Content-Type", ""):
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from unwrap_n8n_results(response.json())
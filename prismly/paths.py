@@ -0,0 +1,14 @@
+"""Location of Prismly's local data files (caches, stores, indexes)."""
+
+import os
+
+DATA_DIR = os.environ.get(
+    "PRISMLY_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".prismly"),
+)
+
+
+def data_path(name):
+    """Return the path of a file inside DATA_DIR, creating the directory if needed"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
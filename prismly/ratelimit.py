@@ -0,0 +1,241 @@
+"""Adaptive OpenAI rate limiting and retry scheduling."""
+
+import random
+import re
+import threading
+import time
+
+import requests
+
+# gpt-4o-mini usage tier 1; replaced by the limits OpenAI reports in response headers
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200000
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Parse OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds"""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers):
+    """Server-requested delay from retry-after-ms / Retry-After, if any"""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    try:
+        return float(headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def exhausted_reset_seconds(headers):
+    """Seconds until an exhausted request or token budget resets, from x-ratelimit-reset-*.
+
+    None when neither budget is used up or the headers are missing.
+    """
+    delays = []
+    for kind in ("requests", "tokens"):
+        try:
+            remaining = float(headers[f"x-ratelimit-remaining-{kind}"])
+        except (KeyError, ValueError):
+            continue
+        reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        if remaining <= 0 and reset is not None:
+            delays.append(reset)
+    return max(delays) if delays else None
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; not thread safe on its own"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` is available (amount is capped at capacity)"""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+
+class RateLimiter:
+    """Token-bucket pacing on requests and tokens per minute.
+
+    Limits start from the defaults and follow the x-ratelimit-* headers
+    OpenAI returns, so pacing adapts to the key's actual tier. Shared by all
+    worker threads of an engine.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        """Block until one request and ``tokens`` tokens fit in the budget"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                delay = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if delay <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= min(tokens, self.tokens.capacity)
+                    self.throttled_seconds += waited
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Hold every caller back for ``seconds`` (used after a 429)"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Sync limits and remaining budget with OpenAI's x-ratelimit-* headers.
+
+        When a budget is used up, callers are held until OpenAI says it resets.
+        """
+        with self._lock:
+            now = time.monotonic()
+            reset = exhausted_reset_seconds(headers)
+            if reset is not None:
+                self.paused_until = max(self.paused_until, now + reset)
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                try:
+                    limit = float(headers[f"x-ratelimit-limit-{kind}"])
+                    remaining = float(headers[f"x-ratelimit-remaining-{kind}"])
+                except (KeyError, ValueError):
+                    continue
+                bucket.refill(now)
+                bucket.capacity = max(limit, 1.0)
+                bucket.level = min(bucket.level, remaining)
+
+
+class RetryScheduler:
+    """Send requests through a RateLimiter, retrying 429/5xx with jittered backoff.
+
+    ``stats()`` reports per-run request, retry, throttling and failure counts.
+    """
+
+    def __init__(self, limiter=None, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, amount in increments.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, send, tokens=0):
+        """Call ``send()`` (returning a requests.Response) until it succeeds.
+
+        Raises the last HTTP or connection error once retries are exhausted,
+        or immediately for non-retryable responses such as 401 or an
+        exhausted quota.
+        """
+        attempt = 0
+        while True:
+            self._count(requests=1, throttled_seconds=self.limiter.acquire(tokens))
+            error = None
+            response = None
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                self.limiter.update_from_headers(response.headers)
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUSES or _quota_exhausted(response):
+                    self._count(failures=1)
+                    response.raise_for_status()
+                if response.status_code == 429:
+                    self._count(rate_limited=1)
+                else:
+                    self._count(server_errors=1)
+
+            if attempt >= self.max_retries:
+                self._count(failures=1)
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+
+            delay = retry_after_seconds(response.headers) if response is not None else None
+            if delay is None and response is not None and response.status_code == 429:
+                delay = exhausted_reset_seconds(response.headers)
+            if delay is None:
+                delay = self.backoff(attempt)
+            if response is not None and response.status_code == 429:
+                # Everyone sharing this key backs off, not just this thread
+                self.limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            self._count(retries=1)
+            attempt += 1
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "failures": self.failures,
+            # The limiter may be shared with other runs; report only this one's waits
+            "throttled_seconds": self.throttled_seconds,
+        }
+
+
+def _quota_exhausted(response):
+    """A 429 for an exhausted billing quota will not clear by waiting"""
+    if response.status_code != 429:
+        return False
+    try:
+        return response.json().get("error", {}).get("code") == "insufficient_quota"
+    except (ValueError, AttributeError):
+        return False
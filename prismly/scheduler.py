@@ -0,0 +1,226 @@
+"""Headless scheduler: analyze feeds on cron schedules and keep the dashboard snapshot fresh.
+
+Runs separately from the Streamlit app. Each due feed group becomes a
+regular job (recorded in its own job store and archived to the result history)
+that only analyzes posts new since the previous check. After every run the
+publication days it touched are re-aggregated into the snapshot the
+dashboard loads.
+
+    OPENAI_API_KEY=sk-... python -m prismly.scheduler schedule.json
+    OPENAI_API_KEY=sk-... python -m prismly.scheduler schedule.json --once
+
+The config is JSON; each feed has a 5-field cron expression (minute hour
+day-of-month month day-of-week, with ``*``, ``*/n``, ``a-b`` and lists) or
+``@hourly``/``@daily``:
+
+    {
+      "max_articles": 20,
+      "snapshot_days": 30,
+      "feeds": [
+        {"url": "https://azure.microsoft.com/en-us/blog/feed/", "schedule": "*/15 * * * *"},
+        {"url": "https://openai.com/blog/rss.xml", "schedule": "@hourly", "max_articles": 10}
+      ]
+    }
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from prismly.cache import DEFAULT_TTL
+from prismly.classifier import DEFAULT_THRESHOLD
+from prismly.engine import DEFAULT_BATCH_TOKEN_BUDGET, DEFAULT_CONCURRENCY
+from prismly.jobs import LOCAL_BACKEND, JobStore, key_id, run_job
+from prismly.paths import data_path
+from prismly.ratelimit import RateLimiter
+from prismly.snapshots import DEFAULT_WINDOW_DAYS, SnapshotStore, run_dates
+
+DEFAULT_MAX_ARTICLES = 20
+# Separate from the app's jobs.sqlite, whose startup marks unfinished jobs as interrupted
+JOB_STORE_FILE = "scheduled_jobs.sqlite"
+
+CRON_ALIASES = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@weekly": "0 0 * * 0"}
+# (low, high) of minute, hour, day of month, month, day of week (0 and 7 are Sunday)
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _cron_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        if spec == "*":
+            first, last = low, high
+        elif "-" in spec:
+            first, last = (int(value) for value in spec.split("-", 1))
+        else:
+            first = last = int(spec)
+            if step:
+                last = high
+        if not low <= first <= last <= high:
+            raise ValueError(f"cron field {part!r} is outside {low}-{high}")
+        values.update(range(first, last + 1, int(step) if step else 1))
+    return values
+
+
+class CronSchedule:
+    """A parsed 5-field cron expression"""
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression {expression!r} needs 5 fields")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # Like cron: if both day fields are restricted, either may match
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment):
+        """First matching minute strictly after ``moment``"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 4)
+        while moment < limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron expression {self.expression!r} never matches")
+
+
+def load_config(path):
+    """Read and validate a scheduler config file"""
+    with open(path, encoding="utf-8") as fileobj:
+        config = json.load(fileobj)
+    if not config.get("feeds"):
+        raise ValueError("config needs a non-empty 'feeds' list")
+    for feed in config["feeds"]:
+        if not feed.get("url") or not feed.get("schedule"):
+            raise ValueError("every feed needs a 'url' and a 'schedule'")
+        CronSchedule(feed["schedule"])
+    return config
+
+
+def job_params(config, feed_urls, max_articles):
+    """Params of a scheduled job: incremental, cached and deduplicated like an analyst run"""
+    return {
+        "backend": LOCAL_BACKEND,
+        "feed_urls": feed_urls,
+        "max_articles": max_articles,
+        "concurrency": config.get("concurrency", DEFAULT_CONCURRENCY),
+        "batch_token_budget": config.get("batch_token_budget", DEFAULT_BATCH_TOKEN_BUDGET),
+        "use_cache": True,
+        "cache_ttl": config.get("cache_ttl", DEFAULT_TTL),
+        "only_new_posts": True,
+        "dedup": config.get("dedup", True),
+        "local_classifier": config.get("local_classifier", False),
+        "local_threshold": config.get("local_threshold", DEFAULT_THRESHOLD),
+        "structured_output": config.get("structured_output", True),
+        "scheduled": True,
+    }
+
+
+class Scheduler:
+    """Run due feeds as jobs and refresh the snapshot after each run"""
+
+    def __init__(self, config, api_key, store=None, snapshots=None):
+        self.config = config
+        self.api_key = api_key
+        self.store = store or JobStore(data_path(JOB_STORE_FILE))
+        self.snapshots = snapshots or SnapshotStore(window_days=config.get("snapshot_days", DEFAULT_WINDOW_DAYS))
+        self.limiter = RateLimiter()
+        self.schedules = [CronSchedule(feed["schedule"]) for feed in config["feeds"]]
+        now = datetime.now()
+        self.next_runs = [schedule.next_after(now) for schedule in self.schedules]
+
+    def run_feeds(self, feeds):
+        """Analyze ``feeds`` as one job per max_articles setting; returns the job IDs"""
+        groups = {}
+        for feed in feeds:
+            max_articles = feed.get("max_articles", self.config.get("max_articles", DEFAULT_MAX_ARTICLES))
+            groups.setdefault(max_articles, []).append(feed["url"])
+        job_ids = []
+        for max_articles, feed_urls in groups.items():
+            params = job_params(self.config, feed_urls, max_articles)
+            job_id = self.store.create(params)
+            self.store.add_usage(key_id(self.api_key), job_id, shared=False)
+            run_job(self.store, job_id, self.api_key, params, self.limiter)
+            job = self.store.get(job_id)
+            records = self.store.results(job_id)
+            # Also drops days that left the window when nothing new came in
+            self.snapshots.refresh(run_dates(records))
+            _log(
+                f"job {job_id}: {job['status']}, {len(records)} new articles from {len(feed_urls)} feeds"
+                + (f" ({job['error']})" if job["error"] else "")
+            )
+            job_ids.append(job_id)
+        return job_ids
+
+    def run_due(self, now=None):
+        """Run every feed whose next scheduled time has passed; returns the job IDs"""
+        now = now or datetime.now()
+        due = [index for index, next_run in enumerate(self.next_runs) if next_run <= now]
+        if not due:
+            return []
+        job_ids = self.run_feeds([self.config["feeds"][index] for index in due])
+        # Ticks missed while a run was in progress collapse into the next one
+        finished = datetime.now()
+        for index in due:
+            self.next_runs[index] = self.schedules[index].next_after(finished)
+        return job_ids
+
+    def run_forever(self):
+        _log(f"scheduling {len(self.schedules)} feeds; next run at {min(self.next_runs):%Y-%m-%d %H:%M}")
+        while True:
+            self.run_due()
+            time.sleep(max(1.0, (min(self.next_runs) - datetime.now()).total_seconds()))
+
+
+def _log(message):
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze feeds on a schedule and keep dashboard snapshots fresh")
+    parser.add_argument("config", help="JSON scheduler config")
+    parser.add_argument("--once", action="store_true", help="analyze every feed once, refresh the snapshot and exit")
+    parser.add_argument("--snapshot-only", action="store_true", help="rebuild the snapshot from history and exit")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if args.snapshot_only:
+        snapshot = SnapshotStore(window_days=config.get("snapshot_days", DEFAULT_WINDOW_DAYS)).refresh()
+        _log(f"snapshot rebuilt: {len(snapshot['days'])} days")
+        return
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        sys.exit("Set OPENAI_API_KEY to run scheduled analyses")
+
+    scheduler = Scheduler(config, api_key)
+    if args.once:
+        scheduler.run_feeds(config["feeds"])
+        return
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
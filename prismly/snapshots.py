@@ -0,0 +1,155 @@
+"""Precomputed dashboard aggregates, refreshed incrementally after each run.
+
+A snapshot holds per-day, per-source buckets (article count, confidence
+sum, sentiment/archetype/insight-category counts and the most confident
+insights) for the last ``window_days`` days of the Parquet result history.
+After a run only the publication days it touched are re-read; older buckets
+are kept and buckets leaving the window are dropped. The dashboard reads the
+JSON file instead of scanning history.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from prismly.history import ResultStore
+from prismly.paths import data_path
+
+SNAPSHOT_FILE = "snapshot.json"
+DEFAULT_WINDOW_DAYS = 30
+TOP_INSIGHTS = 5  # per source
+
+COLUMNS = [
+    "date", "source", "title", "link", "sentiment", "confidence",
+    "archetype", "insight_category", "insight", "recommendation",
+]
+
+
+def _bucket(frame):
+    """Aggregate one day and source of latest analyses"""
+    frame = frame.assign(confidence=frame["confidence"].fillna(0.0))
+    insights = frame[frame["insight"].fillna("") != ""].nlargest(TOP_INSIGHTS, "confidence")
+    return {
+        "articles": len(frame),
+        "confidence_sum": float(frame["confidence"].sum()),
+        "sentiment": frame["sentiment"].value_counts().to_dict(),
+        "archetype": frame["archetype"].value_counts().to_dict(),
+        "insight_category": frame["insight_category"].value_counts().to_dict(),
+        "top_insights": [
+            {
+                "title": row.title,
+                "link": row.link,
+                "category": row.insight_category,
+                "insight": row.insight,
+                "recommendation": row.recommendation,
+                "confidence": float(row.confidence),
+            }
+            for row in insights.itertuples()
+        ],
+    }
+
+
+def run_dates(records, run_date=None):
+    """Publication days (history partitions) a run's records land in"""
+    run_date = (run_date or date.today()).isoformat()
+    return sorted({(record.get("published_at") or "")[:10] or run_date for record in records})
+
+
+class SnapshotStore:
+    """JSON snapshot of dashboard aggregates derived from a ResultStore"""
+
+    def __init__(self, path=None, result_store=None, window_days=DEFAULT_WINDOW_DAYS):
+        self.path = path or data_path(SNAPSHOT_FILE)
+        self.result_store = result_store or ResultStore()
+        self.window_days = window_days
+
+    def load(self):
+        """The stored snapshot, or None if none has been built"""
+        try:
+            with open(self.path, encoding="utf-8") as fileobj:
+                return json.load(fileobj)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, dates=None, today=None):
+        """Rebuild the buckets of ``dates`` (ISO strings), or of the whole window; returns the snapshot.
+
+        A full rebuild also happens when no snapshot exists yet or the
+        window size changed.
+        """
+        today = today or date.today()
+        start = (today - timedelta(days=self.window_days)).isoformat()
+        snapshot = self.load()
+        if snapshot is None or snapshot.get("window_days") != self.window_days or dates is None:
+            snapshot = {"days": {}}
+            dates = None
+        else:
+            dates = [day for day in dates if start <= day <= today.isoformat()]
+
+        if dates is None:
+            frame = self.result_store.latest_analyses(
+                COLUMNS, start=today - timedelta(days=self.window_days), end=today
+            )
+        elif dates:
+            # One scan over the touched range, narrowed back down to the touched days
+            frame = self.result_store.latest_analyses(
+                COLUMNS, start=date.fromisoformat(dates[0]), end=date.fromisoformat(dates[-1])
+            )
+            frame = frame[frame["date"].isin(dates)]
+        else:
+            frame = None
+
+        days = {day: sources for day, sources in snapshot["days"].items() if day >= start}
+        for day in dates or []:
+            days.pop(day, None)
+        if frame is not None:
+            for (day, source), group in frame.groupby(["date", "source"]):
+                days.setdefault(day, {})[source] = _bucket(group)
+
+        snapshot = {
+            "generated_at": time.time(),
+            "window_days": self.window_days,
+            "days": dict(sorted(days.items())),
+        }
+        partial = self.path + ".partial"
+        with open(partial, "w", encoding="utf-8") as fileobj:
+            json.dump(snapshot, fileobj)
+        os.replace(partial, self.path)
+        return snapshot
+
+
+def summarize(snapshot, sources=None):
+    """Roll a snapshot's day buckets up per source.
+
+    Returns {source: {articles, avg_confidence, sentiment, archetype,
+    insight_category, top_insights}}, sources sorted by name.
+    """
+    totals = {}
+    for day_sources in snapshot["days"].values():
+        for source, bucket in day_sources.items():
+            if sources and source not in sources:
+                continue
+            total = totals.setdefault(source, {
+                "articles": 0, "confidence_sum": 0.0, "sentiment": Counter(),
+                "archetype": Counter(), "insight_category": Counter(), "top_insights": [],
+            })
+            total["articles"] += bucket["articles"]
+            total["confidence_sum"] += bucket["confidence_sum"]
+            for field in ("sentiment", "archetype", "insight_category"):
+                total[field].update(bucket[field])
+            total["top_insights"].extend(bucket["top_insights"])
+
+    summary = {}
+    for source in sorted(totals):
+        total = totals[source]
+        summary[source] = {
+            "articles": total["articles"],
+            "avg_confidence": total["confidence_sum"] / total["articles"] if total["articles"] else 0.0,
+            "sentiment": dict(total["sentiment"]),
+            "archetype": dict(total["archetype"]),
+            "insight_category": dict(total["insight_category"]),
+            "top_insights": sorted(total["top_insights"], key=lambda item: -item["confidence"])[:TOP_INSIGHTS],
+        }
+    return summary
@@ -0,0 +1,158 @@
+"""Per-stage pipeline telemetry: durations, bytes, token usage and cost.
+
+One ``Telemetry`` instance collects a run's measurements from every worker
+thread. ``snapshot()`` gives a JSON-serializable summary (stored with the
+job and shown in the ops panel); ``to_openmetrics()`` renders a snapshot in
+the OpenMetrics text format for scraping or archiving.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from prismly.analysis import MODEL
+
+# USD per million tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Stage names in pipeline order
+FEED_FETCH = "feed_fetch"
+FEED_PARSE = "feed_parse"
+DEDUP = "dedup"
+LOCAL_CLASSIFY = "local_classify"
+PROMPT_BUILD = "prompt_build"
+LLM_CALL = "llm_call"
+RESPONSE_PARSE = "response_parse"
+AGGREGATION = "aggregation"
+RENDER = "render"
+N8N_WEBHOOK = "n8n_webhook"
+STAGES = [FEED_FETCH, FEED_PARSE, DEDUP, LOCAL_CLASSIFY, PROMPT_BUILD, LLM_CALL, RESPONSE_PARSE, N8N_WEBHOOK, AGGREGATION, RENDER]
+
+
+def cost_usd(prompt_tokens, completion_tokens, model=MODEL):
+    """Price of a request at the model's list price (0 for unknown models)"""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class Telemetry:
+    """Thread-safe collector of per-stage and per-feed measurements"""
+
+    def __init__(self, model=MODEL):
+        self.model = model
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._feeds = {}
+        self._usage = {"prompt_tokens": 0, "completion_tokens": 0, "llm_articles": 0, "requests": 0}
+
+    def _feed(self, feed):
+        return self._feeds.setdefault(feed, {
+            "seconds": 0.0, "bytes": 0, "articles": 0, "llm_articles": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+        })
+
+    def record(self, stage, seconds, feed=None, size=0):
+        """Add one timed occurrence of ``stage``, optionally attributed to a feed"""
+        with self._lock:
+            totals = self._stages.setdefault(stage, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0})
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            totals["bytes"] += size
+            if feed is not None:
+                feed_totals = self._feed(feed)
+                feed_totals["seconds"] += seconds
+                feed_totals["bytes"] += size
+
+    @contextmanager
+    def stage(self, name, feed=None):
+        """Time the enclosed block as one occurrence of ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, feed=feed)
+
+    def record_usage(self, usage, feed=None, articles=1):
+        """Add the token usage of one chat completion covering ``articles`` articles"""
+        prompt_tokens = usage.get("prompt_tokens", 0) if usage else 0
+        completion_tokens = usage.get("completion_tokens", 0) if usage else 0
+        cost = cost_usd(prompt_tokens, completion_tokens, self.model)
+        with self._lock:
+            self._usage["prompt_tokens"] += prompt_tokens
+            self._usage["completion_tokens"] += completion_tokens
+            self._usage["llm_articles"] += articles
+            self._usage["requests"] += 1
+            if feed is not None:
+                feed_totals = self._feed(feed)
+                feed_totals["prompt_tokens"] += prompt_tokens
+                feed_totals["completion_tokens"] += completion_tokens
+                feed_totals["llm_articles"] += articles
+                feed_totals["cost_usd"] += cost
+
+    def count_articles(self, feed, articles):
+        """Record how many articles a feed contributed to the run"""
+        with self._lock:
+            self._feed(feed)["articles"] += articles
+
+    def snapshot(self):
+        """JSON-serializable summary of everything recorded so far"""
+        with self._lock:
+            usage = dict(self._usage)
+            stages = {name: dict(totals) for name, totals in self._stages.items()}
+            feeds = {feed: dict(totals) for feed, totals in self._feeds.items()}
+        cost = cost_usd(usage["prompt_tokens"], usage["completion_tokens"], self.model)
+        return {
+            "model": self.model,
+            "started_at": self.started_at,
+            "wall_seconds": time.time() - self.started_at,
+            "stages": stages,
+            "feeds": feeds,
+            **usage,
+            "cost_usd": cost,
+            "cost_per_llm_article_usd": cost / usage["llm_articles"] if usage["llm_articles"] else 0.0,
+        }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_openmetrics(snapshot, prefix="prismly"):
+    """Render a snapshot as OpenMetrics text exposition"""
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        suffix = "_total" if kind == "counter" else ""
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {value}" if label_text
+                         else f"{prefix}_{name}{suffix} {value}")
+
+    stages = snapshot["stages"]
+    family("stage_seconds", "counter", "Time spent per pipeline stage.",
+           [({"stage": name}, totals["seconds"]) for name, totals in stages.items()])
+    family("stage_calls", "counter", "Occurrences of each pipeline stage.",
+           [({"stage": name}, totals["count"]) for name, totals in stages.items()])
+    family("stage_max_seconds", "gauge", "Slowest single occurrence per stage.",
+           [({"stage": name}, totals["max_seconds"]) for name, totals in stages.items()])
+    family("stage_bytes", "counter", "Bytes transferred per stage.",
+           [({"stage": name}, totals["bytes"]) for name, totals in stages.items() if totals["bytes"]])
+    family("tokens", "counter", "OpenAI tokens used.",
+           [({"kind": "prompt"}, snapshot["prompt_tokens"]), ({"kind": "completion"}, snapshot["completion_tokens"])])
+    family("llm_requests", "counter", "Chat completion requests.", [({}, snapshot["requests"])])
+    family("cost_usd", "counter", "Estimated OpenAI cost in USD.", [({"model": snapshot["model"]}, snapshot["cost_usd"])])
+    feeds = snapshot["feeds"]
+    family("feed_seconds", "counter", "Fetch and parse time per feed.",
+           [({"feed": feed}, totals["seconds"]) for feed, totals in feeds.items()])
+    family("feed_articles", "counter", "Articles per feed.",
+           [({"feed": feed}, totals["articles"]) for feed, totals in feeds.items()])
+    family("feed_cost_usd", "counter", "Estimated OpenAI cost per feed in USD.",
+           [({"feed": feed}, totals["cost_usd"]) for feed, totals in feeds.items()])
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"